@@ -0,0 +1,274 @@
+import argparse
+import os
+import re
+
+from build_guide import (
+    COVER_BACKGROUND_COLOR,
+    COVER_COLUMN_PADDING,
+    COVER_COLUMN_WIDTH,
+    COVER_MARGIN,
+    COVER_PAGE_WIDTH,
+    get_doc_style,
+)
+from fonts import LOCALE_FONTS
+from locales import LANGUAGES, get_translation
+from profiling import timed_import
+
+MAIN_STYLE = os.path.join(os.path.abspath(os.path.dirname(__file__)), "main.css")
+# CSS pixels per inch
+CSS_DPI = 96
+
+# Every thumbnail shows the top of the cover's title column
+THUMBNAIL_HEIGHT = 300 / 72
+# Format: (horizontal, vertical) in pixels at 72 DPI
+THUMBNAIL_BORDER = (5, 10)
+BANNER_BORDER = 5
+
+# Glyphs are rasterized at this many times the target resolution and then
+# scaled down, which antialiases their edges
+SUPERSAMPLING = 4
+
+
+def css_property(css, selector, name):
+    """The last value of `name` for `selector` in `css`, as the cascade would pick it"""
+    value = None
+    for block in re.findall(re.escape(selector) + r"\s*\{([^}]*)\}", css):
+        for match in re.finditer(r"(?:^|;)\s*" + re.escape(name) + r"\s*:\s*([^;]+)", block):
+            value = match.group(1).strip()
+    return value
+
+
+def title_style(language):
+    """(font size, line height, color) of the cover title, from the same styles the cover uses"""
+    with open(MAIN_STYLE, encoding="utf-8") as fp:
+        css = fp.read() + get_doc_style(language, LOCALE_FONTS[language])
+    font_size, line_height = (
+        float(css_property(css, ".heading", name)[:-len("px")]) for name in ["font-size", "line-height"]
+    )
+    return font_size, line_height, css_property(css, ".heading", "color")
+
+
+def flatten_curve(points, steps=8):
+    """Points along the bezier curve with control points `points`"""
+    flattened = []
+    for step in range(1, steps + 1):
+        t = step / steps
+        curve_points = list(points)
+        # de Casteljau
+        while len(curve_points) > 1:
+            curve_points = [
+                (x0 + (x1 - x0) * t, y0 + (y1 - y0) * t)
+                for (x0, y0), (x1, y1) in zip(curve_points, curve_points[1:])
+            ]
+        flattened.append(curve_points[0])
+    return flattened
+
+
+def make_polygon_pen():
+    BasePen = timed_import("fontTools.pens.basePen").BasePen
+
+    class PolygonPen(BasePen):
+        """Collects the contours of a glyph as polygons in font units"""
+
+        def __init__(self):
+            super().__init__(None)
+            self.contours = []
+            self.contour = []
+
+        def _moveTo(self, point):
+            self.contour = [point]
+
+        def _lineTo(self, point):
+            self.contour.append(point)
+
+        def _curveToOne(self, point1, point2, point3):
+            self.contour += flatten_curve([self._getCurrentPoint(), point1, point2, point3])
+
+        def _qCurveToOne(self, point1, point2):
+            self.contour += flatten_curve([self._getCurrentPoint(), point1, point2])
+
+        def _closePath(self):
+            if len(self.contour) > 2:
+                self.contours.append(self.contour)
+            self.contour = []
+
+        _endPath = _closePath
+
+    return PolygonPen()
+
+
+def shape(hb_font, text, direction):
+    """[(glyph id, x advance, x offset, y offset)] in visual order, in font units"""
+    hb = timed_import("uharfbuzz")
+    buffer = hb.Buffer()
+    buffer.add_str(text)
+    buffer.guess_segment_properties()
+    buffer.direction = direction
+    hb.shape(hb_font, buffer)
+    return [
+        (info.codepoint, position.x_advance, position.x_offset, position.y_offset)
+        for info, position in zip(buffer.glyph_infos, buffer.glyph_positions)
+    ]
+
+
+def wrap_title(hb_font, text, direction, max_width):
+    """Greedily break `text` into lines of at most `max_width` font units"""
+    lines = []
+    for word in text.split():
+        candidate = f"{lines[-1]} {word}" if lines else word
+        if lines and sum(glyph[1] for glyph in shape(hb_font, candidate, direction)) <= max_width:
+            lines[-1] = candidate
+        else:
+            lines.append(word)
+    return lines
+
+
+def fill_nonzero(draw, contours):
+    """
+    Fill the polygons `contours` with the nonzero winding rule like the font
+    renderer does, so overlapping contours of a glyph stay filled and
+    counters drawn in the opposite direction stay open
+    """
+    edges = [
+        (x0, y0, x1, y1)
+        for contour in contours
+        for (x0, y0), (x1, y1) in zip(contour, contour[1:] + contour[:1])
+        if y0 != y1
+    ]
+    if not edges:
+        return
+    top = int(min(min(edge[1], edge[3]) for edge in edges))
+    bottom = int(max(max(edge[1], edge[3]) for edge in edges)) + 1
+    for y in range(top, bottom + 1):
+        # Sample every row at the center of its pixels
+        scan_y = y + 0.5
+        # Format: [(x, winding direction)]
+        crossings = []
+        for x0, y0, x1, y1 in edges:
+            if min(y0, y1) <= scan_y < max(y0, y1):
+                crossings.append((x0 + (scan_y - y0) * (x1 - x0) / (y1 - y0), 1 if y1 > y0 else -1))
+        crossings.sort()
+
+        winding = 0
+        for (x, direction), (next_x, _) in zip(crossings, crossings[1:]):
+            winding += direction
+            if winding != 0 and round(next_x) > round(x):
+                draw.line([(round(x), y), (round(next_x) - 1, y)], fill=1)
+
+
+def render_thumbnail(language, dpi):
+    """
+    The top of the cover's title column for `language`, laid out like the
+    cover page and drawn directly with harfbuzz and PIL
+    """
+    hb = timed_import("uharfbuzz")
+    Image = timed_import("PIL.Image")
+    ImageDraw = timed_import("PIL.ImageDraw")
+
+    scale = dpi * SUPERSAMPLING
+    column_width = (COVER_PAGE_WIDTH - 2 * COVER_MARGIN) * COVER_COLUMN_WIDTH
+    width, height = round(column_width * scale), round(THUMBNAIL_HEIGHT * scale)
+    padding = COVER_COLUMN_PADDING * scale
+
+    hb_font = hb.Font(hb.Face(hb.Blob.from_file_path(LOCALE_FONTS[language][1])))
+    units_per_em = hb_font.face.upem
+    font_size, line_height, title_color = title_style(language)
+    font_size, line_height = (size / CSS_DPI * scale for size in [font_size, line_height])
+    font_scale = font_size / units_per_em
+    extents = hb_font.get_font_extents("ltr")
+    ascender, descender = extents.ascender * font_scale, -extents.descender * font_scale
+
+    direction = "rtl" if language == "ur" else "ltr"
+    title = get_translation(language)("main-title")
+    lines = wrap_title(hb_font, title, direction, (width - 2 * padding) / font_scale)
+
+    text_mask = Image.new("1", (width, height))
+    # The title paragraph has a top margin of 1em inside the column padding
+    line_top = padding + font_size
+    for line in lines:
+        glyphs = shape(hb_font, line, direction)
+        line_width = sum(glyph[1] for glyph in glyphs) * font_scale
+        x = width - padding - line_width if direction == "rtl" else padding
+        # Half the leading goes above the glyphs, as in CSS
+        baseline = line_top + (line_height - ascender - descender) / 2 + ascender
+
+        text_draw = ImageDraw.Draw(text_mask)
+        for glyph_id, x_advance, x_offset, y_offset in glyphs:
+            pen = make_polygon_pen()
+            hb_font.draw_glyph_with_pen(glyph_id, pen)
+            fill_nonzero(text_draw, [
+                [
+                    (x + (point_x + x_offset) * font_scale, baseline - (point_y + y_offset) * font_scale)
+                    for point_x, point_y in contour
+                ]
+                for contour in pen.contours
+            ])
+            x += x_advance * font_scale
+        line_top += line_height
+
+    text_alpha = text_mask.convert("L").resize(
+        (round(column_width * dpi), round(THUMBNAIL_HEIGHT * dpi)), Image.BOX
+    )
+    thumbnail = Image.new("RGB", text_alpha.size, COVER_BACKGROUND_COLOR)
+    thumbnail.paste(title_color, (0, 0), text_alpha)
+    return thumbnail
+
+
+def build_banner(languages, output, dpi=72):
+    """Place the cover thumbnails of `languages` next to each other"""
+    Image = timed_import("PIL.Image")
+    ImageOps = timed_import("PIL.ImageOps")
+
+    border_x, border_y = (round(border * dpi / 72) for border in THUMBNAIL_BORDER)
+    thumbnails = [
+        ImageOps.expand(render_thumbnail(language, dpi), border=(border_x, border_y), fill="white")
+        for language in languages
+    ]
+
+    banner_border = round(BANNER_BORDER * dpi / 72)
+    banner = Image.new(
+        "RGB",
+        (sum(thumbnail.width for thumbnail in thumbnails) + 2 * banner_border, thumbnails[0].height),
+        "white",
+    )
+    x = banner_border
+    for thumbnail in thumbnails:
+        banner.paste(thumbnail, (x, 0))
+        x += thumbnail.width
+    banner.save(output, quality=90)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Build the banner with the cover of every guide next to each other"
+    )
+    parser.add_argument(
+        "--languages",
+        default=",".join(LANGUAGES.keys()),
+        help="Comma separated list of locales to put on the banner, in order",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        default="banner.jpg",
+        help="Output image name",
+    )
+    parser.add_argument(
+        "--dpi",
+        type=int,
+        default=72,
+        help="Resolution of the banner",
+    )
+    args = parser.parse_args()
+
+    languages = [language.strip() for language in args.languages.split(",") if language.strip()]
+    unknown_languages = [language for language in languages if language not in LANGUAGES]
+    if unknown_languages:
+        parser.error(f"unsupported locale(s): {', '.join(unknown_languages)}")
+
+    build_banner(languages, args.output, dpi=args.dpi)
+    print(f"Saved banner to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from PyPDF2 import PdfFileReader
+
+STUB_DIR = os.path.join(os.path.abspath(os.path.dirname(__file__)), "benchmarks", "stub")
+DEFAULT_BASELINE = os.path.join("benchmarks", "baseline.json")
+
+# Format: {engine: (command, supported locales)}
+# {output} is replaced by the output pdf path and {locale} by the locale.
+# Every engine goes through build_guide.py, so all outputs are optimized the
+# same way
+ENGINES = {
+    "wkhtmltopdf": (
+        ["build_guide.py", "--language", "{locale}", "--output", "{output}", "--no-cache"],
+        ["en", "ur", "ta", "si", "hi"],
+    ),
+    "wkhtmltopdf-single-pass": (
+        ["build_guide.py", "--language", "{locale}", "--output", "{output}", "--no-cache",
+         "--engine", "single-pass"],
+        ["en", "ur", "ta", "si", "hi"],
+    ),
+    "reportlab": (
+        ["build_guide.py", "--language", "{locale}", "--output", "{output}", "--engine", "reportlab"],
+        ["en", "ur", "ta", "si", "hi"],
+    ),
+}
+
+
+def run_build(engine, locale, output, env):
+    command, _ = ENGINES[engine]
+    command = [sys.executable] + [
+        arg.format(locale=locale, output=output) for arg in command
+    ]
+
+    # stderr goes to a file rather than a pipe nobody reads while waiting,
+    # which would block a build that writes a lot of warnings
+    with tempfile.TemporaryFile() as stderr:
+        start_time = time.perf_counter()
+        process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=stderr, env=env)
+        if hasattr(os, "wait4"):
+            _, status, rusage = os.wait4(process.pid, 0)
+            process.returncode = os.waitstatus_to_exitcode(status)
+            peak_rss_kb = rusage.ru_maxrss
+        else:
+            process.wait()
+            peak_rss_kb = None
+        seconds = time.perf_counter() - start_time
+
+        if process.returncode != 0:
+            stderr.seek(0)
+            raise RuntimeError(
+                f"{engine} build for {locale} failed:\n{stderr.read().decode('utf-8', 'replace')}"
+            )
+    return seconds, peak_rss_kb
+
+
+def percentile(values, fraction):
+    # Nearest rank percentile
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, round(fraction * len(values) + 0.5) - 1))]
+
+
+def benchmark(engines, locales, repeats, env):
+    results = {}
+    with tempfile.TemporaryDirectory() as output_dir:
+        for engine in engines:
+            for locale in locales:
+                if locale not in ENGINES[engine][1]:
+                    continue
+                print(f"Benchmarking {engine} ({locale})")
+                output = os.path.join(output_dir, f"{engine}-{locale}.pdf")
+
+                timings, peak_rss = [], []
+                for _ in range(repeats):
+                    seconds, peak_rss_kb = run_build(engine, locale, output, env)
+                    timings.append(seconds)
+                    if peak_rss_kb is not None:
+                        peak_rss.append(peak_rss_kb)
+
+                output_size = os.path.getsize(output)
+                with open(output, "rb") as fp:
+                    page_count = PdfFileReader(fp).getNumPages()
+
+                results[f"{engine}/{locale}"] = {
+                    "median_seconds": statistics.median(timings),
+                    "p95_seconds": percentile(timings, 0.95),
+                    "peak_rss_kb": max(peak_rss) if peak_rss else None,
+                    "output_bytes": output_size,
+                    "pages": page_count,
+                    "bytes_per_page": output_size // page_count,
+                }
+    return results
+
+
+def compare(results, baseline, threshold):
+    regressions = []
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+        for metric in ["median_seconds", "p95_seconds", "peak_rss_kb", "output_bytes"]:
+            before, after = baseline[key].get(metric), result.get(metric)
+            if before and after and after > before * (1 + threshold):
+                regressions.append(f"{key} {metric}: {before} -> {after} (+{(after / before - 1) * 100:.1f}%)")
+    return regressions
+
+
+def print_table(results):
+    print(
+        f"{'Engine/locale':<32} {'Median (s)':>10} {'p95 (s)':>9} {'Peak RSS (MB)':>14} "
+        f"{'Size (KB)':>10} {'Pages':>6} {'KB/page':>8}"
+    )
+    for key, result in results.items():
+        peak_rss = f"{result['peak_rss_kb'] / 1024:.1f}" if result["peak_rss_kb"] else "-"
+        print(
+            f"{key:<32} {result['median_seconds']:>10.3f} {result['p95_seconds']:>9.3f} {peak_rss:>14} "
+            f"{result['output_bytes'] / 1024:>10.1f} {result['pages']:>6} {result['bytes_per_page'] / 1024:>8.1f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the wkhtmltopdf and reportlab guide renderers"
+    )
+    parser.add_argument(
+        "--engines",
+        default=",".join(ENGINES.keys()),
+        help="Comma separated list of engines to benchmark",
+    )
+    parser.add_argument(
+        "--languages",
+        default="en,ur,ta,si,hi",
+        help="Comma separated list of locales to benchmark",
+    )
+    parser.add_argument(
+        "-n",
+        "--repeats",
+        type=int,
+        default=5,
+        help="Number of builds per engine and locale",
+    )
+    parser.add_argument(
+        "--stub",
+        action="store_true",
+        help="Use the stub wkhtmltopdf even if the real binary is installed",
+    )
+    parser.add_argument(
+        "--baseline",
+        default=DEFAULT_BASELINE,
+        help="Baseline results to compare against",
+    )
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="Store the results as the new baseline",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="Relative increase over the baseline that counts as a regression",
+    )
+    args = parser.parse_args()
+
+    engines = [engine.strip() for engine in args.engines.split(",") if engine.strip()]
+    unknown_engines = [engine for engine in engines if engine not in ENGINES]
+    if unknown_engines:
+        parser.error(f"unknown engine(s): {', '.join(unknown_engines)}")
+    locales = [locale.strip() for locale in args.languages.split(",") if locale.strip()]
+
+    env = dict(os.environ)
+    use_stub = args.stub or shutil.which("wkhtmltopdf") is None
+    if use_stub:
+        print("Using the stub wkhtmltopdf, wkhtmltopdf timings exclude rendering")
+        env["PATH"] = STUB_DIR + os.pathsep + env.get("PATH", "")
+
+    results = benchmark(engines, locales, args.repeats, env)
+    print_table(results)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline) or ".", exist_ok=True)
+        with open(args.baseline, "w") as fp:
+            json.dump({"wkhtmltopdf_stub": use_stub, "results": results}, fp, indent=4)
+        print(f"Saved baseline to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as fp:
+            baseline = json.load(fp)
+        if baseline.get("wkhtmltopdf_stub") != use_stub:
+            print("Baseline was recorded with a different wkhtmltopdf, timings are not comparable")
+        regressions = compare(results, baseline["results"], args.threshold)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
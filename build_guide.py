@@ -1,41 +1,56 @@
 import argparse
-import pdfkit
 import datetime
-from yattag import Doc
-
-from PIL import Image
-from PyPDF2 import PdfFileMerger
 
+import collections
+import contextlib
+import functools
+import hashlib
 import io
-import i18n
+import json
 import os
-
-HINDI_TRANFORMS = {
-    'के ': 'के ',
-    'र्क ': 'र्क '
-}
-
-CONTRIBUTERS = [
-    ("Anthony Wanyoike Peter", ["Portal screenshots"]),
-    ("Imaduddin Ahmad Dalvi", ["Urdu translation"]),
-    ("Ranjanas Vadivel", ["Sinhala and Tamil translation"]),
-    ("Paul Mary Ranjanas", ["Sinhala and Tamil translation"]),
-    ("Nadir Durrani", ["Urdu translation"]),
-    ("Lamana Mulaffer", ["Sinhala and Tamil translation"]),
-    ("Nijla Mulaffer", ["Sinhala and Tamil translation"])
-]
+import shutil
+import sys
+import tempfile
+
+from concurrent.futures import ThreadPoolExecutor
+
+from fonts import prepare_fonts
+from images import DEFAULT_DPI, prepare_screenshots, prepare_srcset
+from locales import LANGUAGES, get_translation
+from page_cache import PageCache, file_hash, output_mode, page_key
+from page_manifest import contributor_texts, guide_pages, load_manifest, page_text_keys, replace_links
+from pdf_optimize import optimize_pdf
+from preflight import run_preflight
+from profiling import profiler, timed_import
+from wkhtmltopdf_worker import WkhtmltopdfPool
+
+BUILD_MANIFEST_DIR = ".cache/builds"
+
+# Layout of the html guide on top of main.css
+SITE_STYLE = "site.css"
+# Rendered width of the screenshots in the html guide, see site.css
+SITE_IMAGE_SIZES = "(min-width: 60rem) 30rem, (min-width: 48rem) 50vw, 100vw"
+
+# Layout of the cover and end pages in inches, also used to draw the banner
+COVER_PAGE_WIDTH = 8.27
+COVER_MARGIN = 0.5
+# Fraction of the content width taken by each column
+COVER_COLUMN_WIDTH = 0.49
+COVER_COLUMN_PADDING = 0.2
+COVER_BACKGROUND_COLOR = "#a30234"
 
 def render_cover_page(translation, doc_style):
+    texts = page_text_keys(load_manifest(), "cover")
     print(f"Processing page 1")
-    page_width = 8.27
+    page_width = COVER_PAGE_WIDTH
     page_height = page_width
-    MARGIN = 0.5
+    MARGIN = COVER_MARGIN
     BUFFER = 0.1
     half_page_width = (page_width - 2 * MARGIN) / 2
     column_1_offset = 0
     column_2_offset = half_page_width
 
-    doc, tag, text = Doc().tagtext()
+    doc, tag, text = timed_import("yattag").Doc().tagtext()
 
     doc.asis('<!DOCTYPE html>')
     with tag('html'):
@@ -44,31 +59,31 @@ def render_cover_page(translation, doc_style):
                 doc.asis(doc_style)
         with tag('body'):
             with tag('div', style="display: -webkit-box; display: flex; flex-direction: row"):
-                with tag('div', style=f"width: 49%; height: {(page_height-2*MARGIN)}in; background-color: #a30234;"):
-                    with tag('p', style=f"padding: 0.2in;", klass="heading"):
-                        text(translation('main-title'))
-                    with tag('p', style=f"padding: 0.2in; position:absolute; bottom: 0px; width: 40%;", klass="footnote-yellow"):
-                        text(translation('disclaimer'))
+                with tag('div', style=f"width: {COVER_COLUMN_WIDTH:.0%}; height: {(page_height-2*MARGIN)}in; background-color: {COVER_BACKGROUND_COLOR};"):
+                    with tag('p', style=f"padding: {COVER_COLUMN_PADDING}in;", klass="heading"):
+                        text(translation(texts['title'][0]))
+                    with tag('p', style=f"padding: {COVER_COLUMN_PADDING}in; position:absolute; bottom: 0px; width: 40%;", klass="footnote-yellow"):
+                        text(translation(texts['disclaimer'][0]))
                         
-                with tag('div', style=f"width: 49%; height: {(page_height-2*MARGIN)}in;"):
-                    with tag('p', style="margin: 0 0.2in;", klass="subheading"):
-                        text(translation('preparation-title'))
+                with tag('div', style=f"width: {COVER_COLUMN_WIDTH:.0%}; height: {(page_height-2*MARGIN)}in;"):
+                    with tag('p', style=f"margin: 0 {COVER_COLUMN_PADDING}in;", klass="subheading"):
+                        text(translation(texts['preparation-title'][0]))
                     doc.stag('br')
-                    with tag('p', style="margin: 0 0.2in;", klass="text"):
-                        text(translation('time-text'))
+                    with tag('p', style=f"margin: 0 {COVER_COLUMN_PADDING}in;", klass="text"):
+                        text(translation(texts['time'][0]))
                     doc.stag('br')
-                    with tag('ul', style="margin: 0 0.2in;", klass="text"):
-                        for prep_text_idx in range(1, 6):
+                    with tag('ul', style=f"margin: 0 {COVER_COLUMN_PADDING}in;", klass="text"):
+                        for key in texts['preparation']:
                             with tag('li'):
-                                text(translation(f'preparation-text-{prep_text_idx}'))
+                                text(translation(key))
                     doc.stag('br')
-                    with tag('p', style="margin: 0 0.2in;", klass="subheading"):
-                        text(translation('overview-title'))
+                    with tag('p', style=f"margin: 0 {COVER_COLUMN_PADDING}in;", klass="subheading"):
+                        text(translation(texts['overview-title'][0]))
                     doc.stag('br')
-                    with tag('ul', style="margin: 0 0.2in;", klass="text"):
-                        for prep_text_idx in range(1, 3):
+                    with tag('ul', style=f"margin: 0 {COVER_COLUMN_PADDING}in;", klass="text"):
+                        for key in texts['overview']:
                             with tag('li'):
-                                text(translation(f'overview-text-{prep_text_idx}'))
+                                text(translation(key))
     
     options = {
         'page-width': f'{page_width}in',
@@ -87,121 +102,21 @@ def render_cover_page(translation, doc_style):
     # with open('out.html', 'w') as fp:
     #     fp.write(doc.getvalue())
 
-    return pdfkit.from_string(doc.getvalue(), False, options=options)
+    return doc.getvalue(), options
 
-def render_guide_pages(translation, doc_style):
-    # Define page data
-    page_images = [
-        f"assets/lowres-nas-page{page_number}.jpg" for page_number in range(1, 8)
-    ] + [f"assets/lowres-portal-page{page_number}.jpg" for page_number in range(1, 7)]
+def render_guide_pages(translation, doc_style, page_screenshots, image_attributes=None):
+    # `image_attributes` maps a screenshot to the attributes of its <img> tag
+    if image_attributes is None:
+        image_attributes = lambda page_image: {'src': os.path.abspath(page_image)}
+    manifest = load_manifest()
 
     # Format: [(type, text)]
     page_texts = [
         [
-            ("title", translation("nas-title")),
-            (
-                "bullet",
-                translation("nas-page1-text1").replace(
-                    "<NAS_URL>",
-                    '<a href="https://www.nas.gov.qa/self-service/" color="blue"> https://www.nas.gov.qa </a>',
-                ),
-            ),
-            ("bullet", translation("nas-page1-text2")),
-            ("footnote", translation("nas-page1-footnote")),
-        ],
-        [
-            ("title", translation("nas-title")),
-            ("bullet", translation("nas-page2-text1")),
-            ("bullet", translation("nas-page2-text2")),
-        ],
-        [
-            ("title", translation("nas-title")),
-            ("bullet", translation("nas-page3-text1")),
-            ("bullet", translation("nas-page3-text2")),
-            ("bullet", translation("nas-page3-text3")),
-            ("bullet", translation("nas-page3-text4")),
-        ],
-        [
-            ("title", translation("nas-title")),
-            ("bullet", translation("nas-page4-text1")),
-            ("bullet", translation("nas-page4-text2")),
-        ],
-        [
-            ("title", translation("nas-title")),
-            ("bullet", translation("nas-page5-text1")),
-            ("bullet", translation("nas-page5-text2")),
-            ("bullet", translation("nas-page5-text3")),
-            ("bullet", translation("nas-page5-text4")),
-            ("bullet", translation("nas-page5-text5")),
-            ("bullet", translation("nas-page5-text6")),
-            ("bullet", translation("nas-page5-text7")),
-            ("bullet", translation("nas-page5-text8")),
-            ("bullet", translation("nas-page5-text9")),
-            ("bullet", translation("nas-page5-text10")),
-            ("bullet", translation("nas-page5-text11")),
-            ("bullet", translation("nas-page5-text12")),
-        ],
-        [
-            ("title", translation("nas-title")),
-            ("bullet", translation("nas-page6-text1")),
-            ("bullet", translation("nas-page6-text2")),
-            ("bullet", translation("nas-page6-text3")),
-        ],
-        [
-            ("title", translation("nas-title")),
-            ("bullet", translation("nas-page7-text1")),
-            ("footnote", translation("nas-page7-footnote")),
-        ],
-        [
-            ("title", translation("vaccineportal-title")),
-            (
-                "bullet",
-                translation("vaccineportal-page1-text1").replace(
-                    "<PORTAL_URL>",
-                    '<a href="http://app-covid19.moph.gov.qa" color="blue">http://app-covid19.moph.gov.qa</a>',
-                ),
-            ),
-            ("bullet", translation("vaccineportal-page1-text2")),
-            ("footnote", translation("vaccineportal-page1-footnote")),
-        ],
-        [
-            ("title", translation("vaccineportal-title")),
-            ("bullet", translation("vaccineportal-page2-text1")),
-            ("bullet", translation("vaccineportal-page2-text2")),
-            ("bullet", translation("vaccineportal-page2-text3")),
-        ],
-        [
-            ("title", translation("vaccineportal-title")),
-            ("bullet", translation("vaccineportal-page3-text1")),
-            ("bullet", translation("vaccineportal-page3-text2")),
-            ("bullet", translation("vaccineportal-page3-text3")),
-            ("bullet", translation("vaccineportal-page3-text4")),
-        ],
-        [
-            ("title", translation("vaccineportal-title")),
-            ("bullet", translation("vaccineportal-page4-text1")),
-            ("bullet", translation("vaccineportal-page4-text2")),
-            ("bullet", translation("vaccineportal-page4-text3")),
-            ("bullet", translation("vaccineportal-page4-text4")),
-            ("bullet", translation("vaccineportal-page4-text5")),
-        ],
-        [
-            ("title", translation("vaccineportal-title")),
-            ("bullet", translation("vaccineportal-page5-text1")),
-            ("bullet", translation("vaccineportal-page5-text2")),
-            ("bullet", translation("vaccineportal-page5-text3")),
-            ("bullet", translation("vaccineportal-page5-text4")),
-            ("bullet", translation("vaccineportal-page5-text5")),
-            ("bullet", translation("vaccineportal-page5-text6")),
-            ("bullet", translation("vaccineportal-page5-text7")),
-            ("bullet", translation("vaccineportal-page5-text8")),
-            ("bullet", translation("vaccineportal-page5-text9")),
-            ("footnote", translation("vaccineportal-page5-footnote")),
-        ],
-        [
-            ("title", translation("vaccineportal-title")),
-            ("bullet", translation("vaccineportal-page6-text1")),
-        ],
+            (text_type, replace_links(translation(key), manifest.links['wkhtmltopdf']))
+            for text_type, key in page.texts
+        ]
+        for page in guide_pages(manifest)
     ]
 
     page_width = 8.27
@@ -209,16 +124,14 @@ def render_guide_pages(translation, doc_style):
     BUFFER = 0.1
     half_page_width = (page_width - 2 * MARGIN) * 0.485
 
-    page_pdfs = []
-    for page_idx, page_image in enumerate(page_images):
+    pages = []
+    for page_idx, (page_image, (screenshot_width, screenshot_height)) in enumerate(page_screenshots):
         print(f"Processing page {page_idx+2}")
-        page_screenshot = Image.open(page_image)
-        screenshot_width, screenshot_height = page_screenshot.size
         resize_ratio = half_page_width / screenshot_width
 
         page_height = screenshot_height * resize_ratio + MARGIN * 2 + 1
 
-        doc, tag, text = Doc().tagtext()
+        doc, tag, text = timed_import("yattag").Doc().tagtext()
 
         doc.asis('<!DOCTYPE html>')
         with tag('html'):
@@ -228,7 +141,7 @@ def render_guide_pages(translation, doc_style):
             with tag('body'):
                 with tag('div', style="display: -webkit-box; display: flex; flex-direction: row"):
                     with tag('div', style=f"width: 49%; height: {(page_height-2*MARGIN)}in;"):
-                        doc.stag('img', src=os.path.abspath(page_image))
+                        doc.stag('img', **image_attributes(page_image))
                     with tag('div', style=f"width: 49%; height: {(page_height-2*MARGIN)}in;"):
                         titles = [x for x in page_texts[page_idx] if x[0] == 'title']
                         
@@ -261,20 +174,22 @@ def render_guide_pages(translation, doc_style):
             'quiet': None
         }
 
-        page_pdfs.append(pdfkit.from_string(doc.getvalue(), False, options=options))
-    return page_pdfs
+        pages.append((doc.getvalue(), options))
+    return pages
 
 def render_contributers_page(translation, doc_style):
+    manifest = load_manifest()
+    texts = page_text_keys(manifest, "contributors")
     print(f"Processing contributers page")
-    page_width = 8.27
+    page_width = COVER_PAGE_WIDTH
     page_height = page_width
-    MARGIN = 0.5
+    MARGIN = COVER_MARGIN
     BUFFER = 0.1
     half_page_width = (page_width - 2 * MARGIN) / 2
     column_1_offset = 0
     column_2_offset = half_page_width
 
-    doc, tag, text = Doc().tagtext()
+    doc, tag, text = timed_import("yattag").Doc().tagtext()
 
     doc.asis('<!DOCTYPE html>')
     with tag('html'):
@@ -283,31 +198,29 @@ def render_contributers_page(translation, doc_style):
                 doc.asis(doc_style)
         with tag('body'):
             with tag('div', style="display: -webkit-box; display: flex; flex-direction: row"):
-                with tag('div', style=f"width: 49%; height: {(page_height-2*MARGIN)}in; background-color: #a30234;"):
-                    with tag('h1', style=f"padding: 0.2in;", klass="heading"):
-                        text(translation('end-title'))
-                    with tag('p', style=f"padding: 0.2in; position:absolute; bottom: 0px; width: 40%;", klass="footnote-yellow"):
+                with tag('div', style=f"width: {COVER_COLUMN_WIDTH:.0%}; height: {(page_height-2*MARGIN)}in; background-color: {COVER_BACKGROUND_COLOR};"):
+                    with tag('h1', style=f"padding: {COVER_COLUMN_PADDING}in;", klass="heading"):
+                        text(translation(texts['title'][0]))
+                    with tag('p', style=f"padding: {COVER_COLUMN_PADDING}in; position:absolute; bottom: 0px; width: 40%;", klass="footnote-yellow"):
                         text(f"v{datetime.datetime.now().strftime('%Y%m%d')}")
                         
-                with tag('div', style=f"width: 49%; height: {(page_height-2*MARGIN)}in;"):
-                    with tag('h2', style="margin: 0 0.2in;", klass="subheading"):
-                        text(translation('contributors-title'))
+                with tag('div', style=f"width: {COVER_COLUMN_WIDTH:.0%}; height: {(page_height-2*MARGIN)}in;"):
+                    with tag('h2', style=f"margin: 0 {COVER_COLUMN_PADDING}in;", klass="subheading"):
+                        text(translation(texts['contributors-title'][0]))
                     doc.stag('br')
-                    with tag('ul', style="margin: 0 0.2in; direction: ltr;", klass="text"):
-                        for contributer, contributions in sorted(CONTRIBUTERS, key=lambda x: x[0]):
+                    with tag('ul', style=f"margin: 0 {COVER_COLUMN_PADDING}in; direction: ltr;", klass="text"):
+                        for contributer_text in contributor_texts(manifest):
                             with tag('li'):
-                                text(translation(f"{contributer} ({','.join(contributions)})"))
+                                text(contributer_text)
                     doc.stag('br')
-                    with tag('h2', style="margin: 0 0.2in;", klass="subheading"):
-                        text(translation('created-title'))
+                    with tag('h2', style=f"margin: 0 {COVER_COLUMN_PADDING}in;", klass="subheading"):
+                        text(translation(texts['created-title'][0]))
                     doc.stag('br')
-                    with tag('p', style="margin: 0 0.2in; direction: ltr;", klass="text"):
-                        text("Fahim Dalvi")
+                    with tag('p', style=f"margin: 0 {COVER_COLUMN_PADDING}in; direction: ltr;", klass="text"):
+                        text(manifest.creator)
                     doc.stag('br')
-                    with tag('p', style="margin: 0 0.2in;", klass="footnote-red"):
-                        doc.asis(translation("contribution-note").replace(
-                            "<CONTACT_EMAIL>",
-                            '<a href="mailto:fdalvi.vaccine.guide@protonmail.com" color="blue">fdalvi.vaccine.guide@protonmail.com</a>'))
+                    with tag('p', style=f"margin: 0 {COVER_COLUMN_PADDING}in;", klass="footnote-red"):
+                        doc.asis(replace_links(translation(texts['contribution-note'][0]), manifest.links['wkhtmltopdf']))
     
     options = {
         'page-width': f'{page_width}in',
@@ -323,46 +236,123 @@ def render_contributers_page(translation, doc_style):
         'quiet': None
     }
 
-    return pdfkit.from_string(doc.getvalue(), False, options=options)
-
-def text_transformer(text, transforms):
-    for k, v in transforms.items():
-        text = text.replace(k, v)
-    return text
-
-def main():
-    parser = argparse.ArgumentParser()
-
-    parser.add_argument(
-        "-l",
-        "--language",
-        default="en",
-        choices={"en", "ur", "si", "ta", "hi"},
-        help="Locale to generate the guide in",
-    )
-    parser.add_argument(
-        "-o",
-        "--output",
-        required=True,
-        help="Output pdf name",
-    )
-    args = parser.parse_args()
-
-    # Initialize Translation routines
-    i18n.set("locale", args.language)
-    i18n.load_path.append(
-        os.path.join(os.path.abspath(os.path.dirname(__file__)), "translations")
-    )
-    i18n.set("filename_format", "{locale}.{format}")
-    i18n.set("file_format", "json")
-    translation = lambda text_id: i18n.t(text_id)
-
-    if args.language == 'en':
+    return doc.getvalue(), options
+
+def render_pdf(page, cache=None, renderer=None):
+    html, options = page
+    if cache is not None:
+        cache_key = cache.key(html, options)
+        page_pdf = cache.get(cache_key)
+        if page_pdf is not None:
+            return page_pdf
+
+    with profiler.stage("wkhtmltopdf", detail=options['page-height']):
+        if renderer is not None:
+            page_pdf = renderer.render(html, options)
+        else:
+            page_pdf = timed_import("pdfkit").from_string(html, False, options=options)
+
+    if cache is not None:
+        cache.put(cache_key, page_pdf)
+    return page_pdf
+
+def iter_render_pdfs(pages, jobs=1, cache=None, renderer=None):
+    # Each page is rendered by its own wkhtmltopdf subprocess, so threads are
+    # enough to keep several of them busy. Pages are yielded in order as soon
+    # as they are ready, with at most 2 * jobs pages in flight.
+    render = functools.partial(render_pdf, cache=cache, renderer=renderer)
+    if jobs <= 1:
+        for page in pages:
+            yield render(page)
+        return
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        in_flight = collections.deque()
+        for page in pages:
+            if len(in_flight) >= 2 * jobs:
+                yield in_flight.popleft().result()
+            in_flight.append(executor.submit(render, page))
+        while in_flight:
+            yield in_flight.popleft().result()
+
+def render_pdfs(pages, jobs=1, cache=None, renderer=None):
+    return list(iter_render_pdfs(pages, jobs=jobs, cache=cache, renderer=renderer))
+
+@contextlib.contextmanager
+def atomic_output(output):
+    # Write to a temporary file next to the output and only replace the output
+    # once it has been written completely
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(output)), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as fp:
+            yield fp
+        os.chmod(tmp_path, output_mode(output))
+        os.replace(tmp_path, output)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+def page_height(options):
+    return float(options['page-height'][:-len('in')])
+
+def page_body(html):
+    return html[html.index('<body>') + len('<body>'):html.index('</body>')]
+
+def render_single_pass_pdf(pages, cache=None, renderer=None):
+    # wkhtmltopdf only supports a single page size per document, so all pages
+    # are laid out on pages as tall as the tallest one and every page is
+    # cropped back to its own height afterwards.
+    _, base_options = max(pages, key=lambda page: page_height(page[1]))
+    full_page_height = page_height(base_options)
+    margin = float(base_options['margin-top'][:-len('in')])
+
+    first_html, _ = pages[0]
+    doc, tag, text = timed_import("yattag").Doc().tagtext()
+    doc.asis(first_html[:first_html.index('<body>')])
+    with tag('body'):
+        for page_idx, (html, options) in enumerate(pages):
+            content_height = page_height(options) - 2 * margin
+            page_style = f"position: relative; height: {content_height}in; overflow: hidden;"
+            if page_idx < len(pages) - 1:
+                page_style += " page-break-after: always;"
+            with tag('div', style=page_style):
+                doc.asis(page_body(html))
+    doc.asis('</html>')
+
+    document_pdf = render_pdf((doc.getvalue(), base_options), cache=cache, renderer=renderer)
+
+    PyPDF2 = timed_import("PyPDF2")
+    reader = PyPDF2.PdfFileReader(io.BytesIO(document_pdf))
+    if reader.getNumPages() != len(pages):
+        raise RuntimeError(
+            f"Expected {len(pages)} pages from single pass render, got {reader.getNumPages()}"
+        )
+
+    writer = PyPDF2.PdfFileWriter()
+    for page_idx, (_, options) in enumerate(pages):
+        page = reader.getPage(page_idx)
+        cropped_height = (full_page_height - page_height(options)) * 72
+        lower_left_x, lower_left_y = page.mediaBox.lowerLeft
+        page.mediaBox.lowerLeft = (lower_left_x, float(lower_left_y) + cropped_height)
+        writer.addPage(page)
+    return writer
+
+def get_doc_style(language, font_urls, web=False):
+    # The html guide's fonts are woff2 and text is shown in a fallback font
+    # until they have downloaded
+    if web:
+        light_font_source, bold_font_source = (
+            f'src: url("{font_url}") format("woff2");\n            font-display: swap;'
+            for font_url in font_urls
+        )
+    else:
+        light_font_source, bold_font_source = (f'src: url("{font_url}");' for font_url in font_urls)
+    if language == 'en':
         doc_style = '''
         @font-face {
             font-family: 'LightFont';
         ''' + f'''
-            src: url("{os.path.abspath('assets/fonts/roboto-android/Roboto-Light.ttf')}");
+            {light_font_source}
         ''' + '''
             font-weight: 200;
         }
@@ -370,16 +360,16 @@ def main():
         @font-face {
             font-family: 'BoldFont';
         ''' + f'''
-            src: url("{os.path.abspath('assets/fonts/roboto-android/Roboto-Bold.ttf')}");
+            {bold_font_source}
         ''' + '''
         }
         '''
-    elif args.language == 'ur':
+    elif language == 'ur':
         doc_style = '''
         @font-face {
             font-family: 'LightFont';
         ''' + f'''
-            src: url("{os.path.abspath('assets/fonts/urdu/Roboto_NotoNaskhArabic-Regular.ttf')}");
+            {light_font_source}
         ''' + '''
             font-weight: 200;
         }
@@ -387,7 +377,7 @@ def main():
         @font-face {
             font-family: 'BoldFont';
         ''' + f'''
-            src: url("{os.path.abspath('assets/fonts/urdu/Roboto_NotoNaskhArabic-Bold.ttf')}");
+            {bold_font_source}
         ''' + '''
         }
 
@@ -395,12 +385,12 @@ def main():
             direction: rtl;
         }
         '''
-    elif args.language == 'ta':
+    elif language == 'ta':
         doc_style = '''
         @font-face {
             font-family: 'LightFont';
         ''' + f'''
-            src: url("{os.path.abspath('assets/fonts/tamil/NotoSans_NotoSansTamil-Light.ttf')}");
+            {light_font_source}
         ''' + '''
             font-weight: 200;
         }
@@ -408,7 +398,7 @@ def main():
         @font-face {
             font-family: 'BoldFont';
         ''' + f'''
-            src: url("{os.path.abspath('assets/fonts/tamil/NotoSans_NotoSansTamil-Bold.ttf')}");
+            {bold_font_source}
         ''' + '''
         }
 
@@ -442,12 +432,12 @@ def main():
             font-weight: 100;
         }
         '''
-    elif args.language == 'si':
+    elif language == 'si':
         doc_style = '''
         @font-face {
             font-family: 'LightFont';
         ''' + f'''
-            src: url("{os.path.abspath('assets/fonts/sinhala/NotoSans_NotoSansSinhala-Light.ttf')}");
+            {light_font_source}
         ''' + '''
             font-weight: 200;
         }
@@ -455,7 +445,7 @@ def main():
         @font-face {
             font-family: 'BoldFont';
         ''' + f'''
-            src: url("{os.path.abspath('assets/fonts/sinhala/NotoSans_NotoSansSinhala-Bold.ttf')}");
+            {bold_font_source}
         ''' + '''
         }
 
@@ -489,12 +479,12 @@ def main():
             font-weight: 100;
         }
         '''
-    elif args.language == 'hi':
+    elif language == 'hi':
         doc_style = '''
         @font-face {
             font-family: 'LightFont';
         ''' + f'''
-            src: url("{os.path.abspath('assets/fonts/hindi/NotoSans_NotoSansDevanagari-Light.ttf')}");
+            {light_font_source}
         ''' + '''
             font-weight: 200;
         }
@@ -502,22 +492,523 @@ def main():
         @font-face {
             font-family: 'BoldFont';
         ''' + f'''
-            src: url("{os.path.abspath('assets/fonts/hindi/NotoSans_NotoSansDevanagari-Bold.ttf')}");
+            {bold_font_source}
         ''' + '''
         }
         '''
 
-        translation = lambda text_id: text_transformer(i18n.t(text_id), HINDI_TRANFORMS)
+    return doc_style
 
-    cover_pdf = render_cover_page(translation, doc_style)
-    guide_pdfs = render_guide_pages(translation, doc_style)
-    contributers_pdf = render_contributers_page(translation, doc_style)
-
-    merger = PdfFileMerger()
-    for page in [cover_pdf] + guide_pdfs + [contributers_pdf]:
-        merger.append(io.BytesIO(page), import_bookmarks=False)
-    merger.write(args.output)
+def load_page_screenshots(dpi=DEFAULT_DPI):
+    # Screenshots are identical across languages, so they are only prepared
+    # once per process. They are resized to the width of the screenshot column
+    # in render_guide_pages.
+    page_width = 8.27
+    MARGIN = 0.5
+    half_page_width = (page_width - 2 * MARGIN) * 0.485
+    return prepare_screenshots(half_page_width, dpi=dpi)
+
+def build_manifest_path(output):
+    output_id = hashlib.sha256(os.path.abspath(output).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(BUILD_MANIFEST_DIR, f"{output_id}.json")
+
+def load_build_manifest(output):
+    # The manifest only describes `output` if nothing else wrote it since
+    manifest_path = build_manifest_path(output)
+    if not os.path.exists(manifest_path) or not os.path.exists(output):
+        return None
+    with open(manifest_path) as fp:
+        build_manifest = json.load(fp)
+    if build_manifest.get('output_hash') != file_hash(output):
+        return None
+    return build_manifest
+
+def save_build_manifest(output, page_keys, page_counts):
+    os.makedirs(BUILD_MANIFEST_DIR, exist_ok=True)
+    with open(build_manifest_path(output), 'w') as fp:
+        json.dump({
+            'output_hash': file_hash(output),
+            'pages': [
+                {'key': key, 'page_count': page_count}
+                for key, page_count in zip(page_keys, page_counts)
+            ]
+        }, fp, indent=4)
+
+def remove_build_manifest(output):
+    if os.path.exists(build_manifest_path(output)):
+        os.remove(build_manifest_path(output))
+
+def build_incremental(pages, output, jobs=1, cache=None, renderer=None):
+    # Only pages whose inputs changed since the previous build of `output` are
+    # rendered, the rest are copied over from the previous output
+    page_keys = [page_key(html, options) for html, options in pages]
+
+    previous_build = load_build_manifest(output)
+    previous_pages = {}
+    if previous_build is not None:
+        with open(output, 'rb') as fp:
+            previous_pdf = io.BytesIO(fp.read())
+        start_page = 0
+        for previous_page in previous_build['pages']:
+            previous_pages[previous_page['key']] = (start_page, start_page + previous_page['page_count'])
+            start_page += previous_page['page_count']
+
+    changed_pages = [page_idx for page_idx, key in enumerate(page_keys) if key not in previous_pages]
+    print(f"Rendering {len(changed_pages)} of {len(pages)} pages")
+    rendered_pdfs = dict(zip(
+        changed_pages,
+        render_pdfs([pages[page_idx] for page_idx in changed_pages], jobs=jobs, cache=cache, renderer=renderer)
+    ))
+
+    PyPDF2 = timed_import("PyPDF2")
+    merger = PyPDF2.PdfFileMerger()
+    page_counts = []
+    for page_idx, key in enumerate(page_keys):
+        if page_idx in rendered_pdfs:
+            page_pdf = PyPDF2.PdfFileReader(io.BytesIO(rendered_pdfs[page_idx]))
+            page_counts.append(page_pdf.getNumPages())
+            merger.append(page_pdf, import_bookmarks=False)
+        else:
+            start_page, end_page = previous_pages[key]
+            page_counts.append(end_page - start_page)
+            merger.append(previous_pdf, pages=(start_page, end_page), import_bookmarks=False)
+    with profiler.stage("merge"), atomic_output(output) as fp:
+        merger.write(fp)
     merger.close()
 
+    save_build_manifest(output, page_keys, page_counts)
+
+def build_guide(language, output, page_screenshots, engine="per-page", jobs=1, cache=None, incremental=False,
+                subset_fonts=True, renderer=None):
+    print(f"Building {LANGUAGES[language]} guide")
+    profiler.language = language
+
+    with profiler.stage("translation loading"):
+        translation = get_translation(language)
+    with profiler.stage("font preparation"):
+        font_paths = prepare_fonts(
+            language,
+            subset_fonts=subset_fonts,
+        )
+    doc_style = get_doc_style(language, [os.path.abspath(font_path) for font_path in font_paths])
+
+    with profiler.stage("html generation"):
+        cover_page = render_cover_page(translation, doc_style)
+        content_pages = render_guide_pages(translation, doc_style, page_screenshots)
+        contributers_page = render_contributers_page(translation, doc_style)
+
+    pages = [cover_page] + content_pages + [contributers_page]
+
+    if incremental:
+        build_incremental(pages, output, jobs=jobs, cache=cache, renderer=renderer)
+        return
+    remove_build_manifest(output)
+
+    if engine == "single-pass":
+        writer = render_single_pass_pdf(pages, cache=cache, renderer=renderer)
+        with profiler.stage("merge"), atomic_output(output) as fp:
+            writer.write(fp)
+        return
+
+    # Rendered pages are spooled to disk as they arrive rather than kept in
+    # memory until every page is done
+    with tempfile.TemporaryDirectory() as spool_dir:
+        merger = timed_import("PyPDF2").PdfFileMerger()
+        for page_idx, page_pdf in enumerate(iter_render_pdfs(pages, jobs=jobs, cache=cache, renderer=renderer)):
+            page_path = os.path.join(spool_dir, f"page{page_idx}.pdf")
+            with open(page_path, 'wb') as fp:
+                fp.write(page_pdf)
+            merger.append(page_path, import_bookmarks=False)
+        with profiler.stage("merge"), atomic_output(output) as fp:
+            merger.write(fp)
+        merger.close()
+
+def build_bundle(languages, outputs, output):
+    # Each locale gets its own top level bookmark. The screenshots are the
+    # same in every locale, so optimizing the bundle stores them only once
+    pikepdf = timed_import("pikepdf")
+    with profiler.stage("merge"), pikepdf.new() as bundle, contextlib.ExitStack() as stack:
+        with bundle.open_outline() as outline:
+            for language in languages:
+                language_pdf = stack.enter_context(pikepdf.open(outputs[language]))
+                outline.root.append(pikepdf.OutlineItem(LANGUAGES[language].capitalize(), len(bundle.pages)))
+                bundle.pages.extend(language_pdf.pages)
+        bundle.Root.PageMode = pikepdf.Name.UseOutlines
+        with atomic_output(output) as fp:
+            bundle.save(fp)
+
+def optimize_output(output):
+    # Separately rendered pages each embed their own copy of the fonts and
+    # other shared resources
+    # Optimizing keeps the pages, so a valid build manifest stays valid for
+    # the optimized pdf
+    build_manifest = load_build_manifest(output)
+    with profiler.stage("optimize"):
+        size_before, size_after = optimize_pdf(output)
+    if build_manifest is not None:
+        save_build_manifest(
+            output,
+            [page['key'] for page in build_manifest['pages']],
+            [page['page_count'] for page in build_manifest['pages']],
+        )
+    print(f"Optimized {output}: {size_before // 1024} KB -> {size_after // 1024} KB")
+
+def copy_site_file(path, output_dir, sub_dir):
+    # Fonts and images are content addressed or checked in, so their names
+    # never clash. Returns the url of the copy relative to the site root.
+    os.makedirs(os.path.join(output_dir, sub_dir), exist_ok=True)
+    url = f"{sub_dir}/{os.path.basename(path)}"
+    shutil.copyfile(path, os.path.join(output_dir, url))
+    return url
+
+def write_site_assets(output_dir):
+    # The page builders' styles plus the mobile layout in a single stylesheet
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, 'style.css'), 'w', encoding='utf-8') as fp:
+        for style_path in ['main.css', SITE_STYLE]:
+            with open(style_path, encoding='utf-8') as style_fp:
+                fp.write(style_fp.read() + '\n')
+
+def write_site_index(languages, output_dir):
+    doc, tag, text = timed_import("yattag").Doc().tagtext()
+    doc.asis('<!DOCTYPE html>')
+    with tag('html'):
+        with tag('head'):
+            doc.stag('meta', charset='utf-8')
+            doc.stag('meta', name='viewport', content='width=device-width, initial-scale=1')
+            with tag('title'):
+                text(get_translation('en')('main-title'))
+            doc.stag('link', rel='stylesheet', href='style.css')
+        with tag('body'):
+            with tag('ul', klass='languages'):
+                for language in languages:
+                    with tag('li', lang=language):
+                        with tag('a', href=f'{language}.html', klass='subheading'):
+                            text(get_translation(language)('main-title'))
+    with open(os.path.join(output_dir, 'index.html'), 'w', encoding='utf-8') as fp:
+        fp.write(doc.getvalue())
+
+def build_site(language, output_dir, subset_fonts=True):
+    # The same pages as the pdf guide, as a single html page with external
+    # styles, woff2 fonts and responsive, lazily loaded screenshots
+    print(f"Building {LANGUAGES[language]} site")
+    profiler.language = language
+
+    with profiler.stage("translation loading"):
+        translation = get_translation(language)
+    with profiler.stage("font preparation"):
+        font_paths = prepare_fonts(language, subset_fonts=subset_fonts, flavor='woff2')
+        font_urls = [copy_site_file(font_path, output_dir, 'fonts') for font_path in font_paths]
+
+    with profiler.stage("screenshot preparation"):
+        # Format: {screenshot: [(url, (width, height))]}
+        srcsets = {
+            page.image: [
+                (copy_site_file(path, output_dir, 'images'), size)
+                for path, size in prepare_srcset(page.image)
+            ]
+            for page in guide_pages(load_manifest())
+        }
+    page_screenshots = [(page.image, srcsets[page.image][0][1]) for page in guide_pages(load_manifest())]
+
+    def image_attributes(page_image):
+        src, (width, height) = srcsets[page_image][0]
+        return {
+            'src': src,
+            'srcset': ', '.join(f"{url} {candidate_width}w" for url, (candidate_width, _) in srcsets[page_image]),
+            'sizes': SITE_IMAGE_SIZES,
+            'width': str(width),
+            'height': str(height),
+            'alt': '',
+            'loading': 'lazy',
+            'decoding': 'async',
+        }
+
+    with profiler.stage("html generation"):
+        pages = (
+            [render_cover_page(translation, '')]
+            + render_guide_pages(translation, '', page_screenshots, image_attributes=image_attributes)
+            + [render_contributers_page(translation, '')]
+        )
+
+        doc, tag, text = timed_import("yattag").Doc().tagtext()
+        doc.asis('<!DOCTYPE html>')
+        with tag('html', lang=language, dir='rtl' if language == 'ur' else 'ltr'):
+            with tag('head'):
+                doc.stag('meta', charset='utf-8')
+                doc.stag('meta', name='viewport', content='width=device-width, initial-scale=1')
+                with tag('title'):
+                    text(translation('main-title'))
+                doc.stag('link', rel='stylesheet', href='style.css')
+                doc.stag('link', rel='stylesheet', href=f'{language}.css')
+            with tag('body'):
+                for html, _ in pages:
+                    with tag('section', klass='page'):
+                        doc.asis(page_body(html))
+
+    with open(os.path.join(output_dir, f'{language}.css'), 'w', encoding='utf-8') as fp:
+        fp.write(get_doc_style(language, font_urls, web=True))
+    with open(os.path.join(output_dir, f'{language}.html'), 'w', encoding='utf-8') as fp:
+        fp.write(doc.getvalue())
+
+def main():
+    parser = argparse.ArgumentParser()
+
+    language_group = parser.add_mutually_exclusive_group()
+    language_group.add_argument(
+        "-l",
+        "--language",
+        choices=LANGUAGES.keys(),
+        help="Locale to generate the guide in",
+    )
+    language_group.add_argument(
+        "--languages",
+        help="Comma separated list of locales to generate guides for in a single run",
+    )
+    language_group.add_argument(
+        "--all",
+        action="store_true",
+        help="Generate guides for all supported locales",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        help="Output pdf name. When building multiple locales, this is a template "
+             "where {locale} is replaced by the locale code and {language} by the "
+             "language name, e.g. guide-{language}.pdf. The site directory with --format html",
+    )
+    parser.add_argument(
+        "--bundle",
+        action="store_true",
+        help="Write all requested locales into the single pdf given by --output, "
+             "with a bookmark per locale and the screenshots stored once",
+    )
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="Only check the translations and font coverage of the locales, "
+             "without building anything",
+    )
+    parser.add_argument(
+        "--format",
+        default="pdf",
+        choices=["pdf", "html"],
+        help="Write a pdf per locale, or a static html site for phones with a page "
+             "per locale into the --output directory",
+    )
+    parser.add_argument(
+        "--engine",
+        default="per-page",
+        choices=["per-page", "single-pass", "reportlab"],
+        help="Render each page with its own wkhtmltopdf call, all pages of "
+             "a locale with a single call, or draw the guide in-process with reportlab",
+    )
+    parser.add_argument(
+        "--renderer",
+        default="persistent",
+        choices=["persistent", "subprocess"],
+        help="Keep wkhtmltopdf processes running across pages and locales, or "
+             "start a new wkhtmltopdf process for every page",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of pages to render in parallel",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Render every page even if an identical page was rendered before",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=".cache/pages",
+        help="Directory to store rendered pages in",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=200,
+        help="Maximum size of the page cache in MB",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only re-render the pages whose inputs changed since the previous "
+             "build of the same output, and reuse the rest from that output",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="After building, keep watching the translations, styles, page manifest "
+             "and assets, and rebuild the affected locales whenever they change",
+    )
+    parser.add_argument(
+        "--no-font-subset",
+        action="store_true",
+        help="Embed the full fonts instead of subsets with only the glyphs used by the guide",
+    )
+    parser.add_argument(
+        "--no-optimize",
+        action="store_true",
+        help="Skip sharing identical fonts, images and other objects between "
+             "pages and compressing the output. Pages rendered separately by "
+             "wkhtmltopdf embed different font subsets, which are not merged",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Record the time and memory use of every build stage",
+    )
+    parser.add_argument(
+        "--profile-memory",
+        action="store_true",
+        help="Also record the peak Python allocations of every build stage, implies "
+             "--profile. Tracing allocations slows Python code down several times, "
+             "so stage times are not comparable",
+    )
+    parser.add_argument(
+        "--profile-dir",
+        default="profile",
+        help="Directory to write the per locale profiling reports to",
+    )
+    parser.add_argument(
+        "--image-dpi",
+        type=int,
+        default=DEFAULT_DPI,
+        help="Resolution to resize the screenshots to",
+    )
+    args = parser.parse_args()
+
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    if args.incremental and args.engine != "per-page":
+        parser.error("--incremental is only supported with the per-page engine")
+
+    if args.all:
+        languages = list(LANGUAGES.keys())
+    elif args.languages:
+        languages = [language.strip() for language in args.languages.split(",") if language.strip()]
+        unknown_languages = [language for language in languages if language not in LANGUAGES]
+        if unknown_languages:
+            parser.error(f"unsupported locale(s): {', '.join(unknown_languages)}")
+    else:
+        languages = [args.language or "en"]
+
+    if args.check and args.watch:
+        parser.error("--watch cannot be used with --check")
+    if not args.check:
+        if not args.output:
+            parser.error("the following arguments are required: -o/--output")
+        if args.bundle and args.incremental:
+            parser.error("--incremental is not supported with --bundle")
+        if args.format == "html" and (args.bundle or args.incremental or args.engine != "per-page"):
+            parser.error("--format html cannot be used with --bundle, --incremental or --engine")
+        if (len(languages) > 1 and not args.bundle and args.format == "pdf"
+                and "{locale}" not in args.output and "{language}" not in args.output):
+            parser.error("--output must contain {locale} or {language} when building multiple locales")
+
+    profiler.enabled = args.profile or args.profile_memory
+    profiler.trace_memory = args.profile_memory
+
+    # Problems in the translations or fonts are reported before anything is
+    # rendered
+    if not run_preflight(languages):
+        sys.exit(1)
+    if args.check:
+        print(f"Checked {', '.join(languages)}, no errors found")
+        return
+
+    with contextlib.ExitStack() as stack:
+        # Bundled locales are built separately first, then merged into one pdf
+        if args.bundle:
+            bundle_dir = stack.enter_context(tempfile.TemporaryDirectory())
+            outputs = {language: os.path.join(bundle_dir, f"{language}.pdf") for language in languages}
+        else:
+            outputs = {
+                language: args.output.format(locale=language, language=LANGUAGES[language])
+                for language in languages
+            }
+
+        if args.format == "pdf" and args.engine != "reportlab":
+            cache = None if args.no_cache else PageCache(args.cache_dir, args.cache_size * 1024 * 1024)
+            # Kept running between rebuilds in watch mode
+            if args.renderer == "persistent":
+                renderer = stack.enter_context(WkhtmltopdfPool(size=args.jobs))
+            else:
+                renderer = None
+
+        def build_languages(selected_languages, incremental=args.incremental, optimize=not args.no_optimize):
+            if args.format == "html":
+                write_site_assets(args.output)
+                write_site_index(languages, args.output)
+                for language in selected_languages:
+                    build_site(language, args.output, subset_fonts=not args.no_font_subset)
+                return
+
+            if args.engine == "reportlab":
+                for language in selected_languages:
+                    print(f"Building {LANGUAGES[language]} guide")
+                    remove_build_manifest(outputs[language])
+                    timed_import("build_guide_reportlab").build_guide(
+                        language, outputs[language], subset_fonts=not args.no_font_subset,
+                        image_dpi=args.image_dpi
+                    )
+            else:
+                with profiler.stage("screenshot preparation"):
+                    page_screenshots = load_page_screenshots(dpi=args.image_dpi)
+                for language in selected_languages:
+                    build_guide(language, outputs[language], page_screenshots, engine=args.engine,
+                                jobs=args.jobs, cache=cache, incremental=incremental,
+                                subset_fonts=not args.no_font_subset, renderer=renderer)
+
+            built_outputs = [outputs[language] for language in selected_languages]
+            if args.bundle:
+                profiler.language = None
+                build_bundle(languages, outputs, args.output)
+                built_outputs = [args.output]
+
+            if optimize:
+                for output in built_outputs:
+                    optimize_output(output)
+
+        # Watch mode rebuilds reuse the unchanged pages of the previous build
+        build_languages(languages, incremental=args.incremental or (args.watch and args.engine == "per-page"))
+
+        if args.watch:
+            watch = timed_import("watch")
+            print("Watching translations, styles, the page manifest and assets for changes, "
+                  "press Ctrl+C to stop")
+            snapshot = watch.snapshot()
+            try:
+                while True:
+                    changed_paths, snapshot = watch.wait_for_changes(snapshot)
+                    changed_languages = watch.affected_languages(changed_paths, languages)
+                    if not changed_languages:
+                        continue
+                    print(f"Changed: {', '.join(sorted(os.path.relpath(path) for path in changed_paths))}")
+
+                    watch.reload_inputs()
+                    if not run_preflight(changed_languages):
+                        print("Not rebuilding until the errors are fixed")
+                        continue
+
+                    try:
+                        # Only the pages whose inputs changed are rendered again
+                        build_languages(changed_languages, incremental=args.engine == "per-page",
+                                        optimize=False)
+                    except Exception as e:
+                        print(f"Error: rebuilding failed: {e!r}")
+                        continue
+                    print(f"Rebuilt {', '.join(LANGUAGES[language] for language in changed_languages)}")
+            except KeyboardInterrupt:
+                pass
+
+    if profiler.enabled:
+        profiler.write_reports(args.profile_dir)
+        print(profiler.summary())
+
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -1,76 +1,100 @@
 import argparse
 import datetime
-import i18n
+import functools
 import os
-
-from PIL import Image
+import sys
 
 from reportlab.pdfgen import canvas
-from reportlab.platypus import Paragraph, FragLine, ParaLines
+from reportlab.platypus import Paragraph
 from reportlab.lib.styles import ParagraphStyle
 from reportlab.lib.units import inch
+from reportlab.lib.utils import ImageReader
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.enums import TA_JUSTIFY, TA_LEFT, TA_CENTER, TA_RIGHT
 
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 
-import arabic_reshaper
+from fonts import prepare_fonts
+from images import DEFAULT_DPI, prepare_screenshots
+from locales import LANGUAGES, get_translation
+from page_manifest import contributor_texts, guide_pages, load_manifest, page_text_keys, replace_links
+from preflight import run_preflight
+from profiling import profiler, timed_import
+
+# Format: {(text, style, width, paragraph transformer): (paragraph, (width, height))}
+paragraph_layouts = {}
 
-from bidi.algorithm import get_display
 
-CONTRIBUTERS = [
-    ("Anthony Wanyoike Peter", ["Portal screenshots"]),
-    ("Imaduddin Ahmad Dalvi", ["Urdu translation"]),
-    ("Ranjanas Vadivel", ["Sinhala and Tamil translation"]),
-    ("Paul Mary Ranjanas", ["Sinhala and Tamil translation"]),
-]
+def wrap_paragraph(paragraph, width, height, paragraph_transformer):
+    with profiler.stage("Paragraph.wrap"):
+        size = paragraph.wrap(width, height)
+    with profiler.stage("paragraph_transformer"):
+        paragraph_transformer(paragraph)
+    return size
 
 
-def text_transform_urdu(text):
-    reshaper = arabic_reshaper.ArabicReshaper({"language": "Urdu"})
-    reshaper = arabic_reshaper.ArabicReshaper(
-        arabic_reshaper.config_for_true_type_font(
-            "assets/fonts/urdu/Roboto_NotoNaskhArabic-Regular.ttf",
-            arabic_reshaper.ENABLE_ALL_LIGATURES,
+def style_key(style):
+    return tuple(
+        sorted(
+            (attribute, repr(value))
+            for attribute, value in style.__dict__.items()
+            if attribute not in ("name", "parent")
         )
     )
-    reshaped_text = reshaper.reshape(text)
-    return reshaped_text
 
 
-def paragraph_transform_urdu(paragraph):
-    # Inplace line reverser
-    transformed_lines = []
-    for line in paragraph.blPara.lines:
-        if isinstance(line, tuple):
-            transformed_lines.append(
-                (line[0], get_display(" ".join(line[1])).split(" "))
-            )
-        elif isinstance(line, FragLine):
-            for subline in line.words:
-                subline.text = get_display(subline.text)
-            transformed_lines.append(line)
-        elif isinstance(line, ParaLines):
-            for subline in line.words:
-                subline.text = get_display(subline.text)
-            transformed_lines.append(line)
-        else:
-            assert False, f"Unhandled line type {type(line)}"
-    paragraph.blPara.lines = transformed_lines
+def layout_paragraph(text, style, width, height, paragraph_transformer):
+    """
+    Wrapped and transformed Paragraph for `text`. Layouts are shared by every
+    page, and every build in the same process, that draws the same text with
+    the same style at the same width. Fonts are registered under the name of
+    the font file, so the style also pins the exact font the text was laid
+    out with.
+    """
+    key = (text, style_key(style), width, paragraph_transformer)
+    if key not in paragraph_layouts:
+        paragraph = Paragraph(text, style=style)
+        size = wrap_paragraph(paragraph, width, height, paragraph_transformer)
+        paragraph_layouts[key] = (paragraph, size)
+    return paragraph_layouts[key]
 
 
-def main():
-    parser = argparse.ArgumentParser()
+def draw_paragraph(paragraph, canvas, x, y):
+    with profiler.stage("drawOn"):
+        paragraph.drawOn(canvas, x, y)
 
-    parser.add_argument(
-        "-l",
-        "--language",
-        default="en",
-        choices={"en", "ur", "si", "ta"},
-        help="Locale to generate the guide in",
-    )
-    args = parser.parse_args()
+
+@functools.lru_cache(maxsize=None)
+def get_image_reader(image_path):
+    # Drawing the same ImageReader again makes the canvas reference the image
+    # XObject it already wrote instead of embedding the image once more
+    return ImageReader(image_path)
+
+
+def keep_paragraph(paragraph):
+    pass
+
+
+def register_font(font_path):
+    # Subsetted fonts are named after their contents, so every distinct font
+    # gets its own name even when several locales are built in one process.
+    # reportlab also shares fonts by their PostScript name, which the merged
+    # fonts of different locales have in common (e.g. NotoSans-Light), so the
+    # face is renamed to match.
+    font_name = os.path.splitext(os.path.basename(font_path))[0]
+    if font_name not in pdfmetrics.getRegisteredFontNames():
+        font = TTFont(font_name, font_path)
+        font.face.name = font_name.encode("ascii")
+        pdfmetrics.registerFont(font)
+    return font_name
+
+
+def build_guide(language, output, subset_fonts=True, image_dpi=DEFAULT_DPI):
+    profiler.language = language
+    manifest = load_manifest()
+    cover_texts = page_text_keys(manifest, "cover")
+    end_texts = page_text_keys(manifest, "contributors")
 
     # Default PDF page width will be same as A4, but height will be dependent
     # on the screenshot itself
@@ -80,122 +104,119 @@ def main():
     half_page_width = (page_width - 2 * MARGIN) / 2
 
     # Set text, alignment and font settings based on locale
-    if args.language == "en":
+    shaping = 0
+    if language == "en":
         text_alignment = TA_LEFT
         text_transformer = lambda x: x
-        paragraph_transformer = lambda x: x
-        pdfmetrics.registerFont(
-            TTFont("Font-light", "assets/fonts/roboto-android/Roboto-Light.ttf")
-        )
-        pdfmetrics.registerFont(
-            TTFont("Font-bold", "assets/fonts/roboto-android/Roboto-Bold.ttf")
-        )
+        paragraph_transformer = keep_paragraph
         column_1_offset = 0
         column_2_offset = half_page_width
-    elif args.language == "ur":
+    elif language == "ur":
+        # Reshaping and bidi are only needed, and only imported, for Urdu
+        urdu = timed_import("urdu")
+        urdu.load_urdu_cache()
+        with profiler.stage("urdu preprocessing"):
+            urdu.prepare_urdu_texts()
         text_alignment = TA_RIGHT
-        text_transformer = text_transform_urdu
-        paragraph_transformer = paragraph_transform_urdu
-        pdfmetrics.registerFont(
-            TTFont("Font-light", "assets/fonts/urdu/Roboto_NotoNaskhArabic-Regular.ttf")
-        )
-        pdfmetrics.registerFont(
-            TTFont("Font-bold", "assets/fonts/urdu/Roboto_NotoNaskhArabic-Bold.ttf")
-        )
+        text_transformer = urdu.text_transform_urdu
+        paragraph_transformer = urdu.paragraph_transform_urdu
         column_1_offset = half_page_width
         column_2_offset = 0
-    elif args.language == "si":
+    elif language == "si":
         text_alignment = TA_LEFT
         text_transformer = lambda x: x
-        paragraph_transformer = lambda x: x
-        pdfmetrics.registerFont(
-            TTFont("Font-light", "assets/fonts/sinhala/NotoSans_NotoSansSinhala-Light.ttf")
-        )
-        pdfmetrics.registerFont(
-            TTFont("Font-bold", "assets/fonts/sinhala/NotoSans_NotoSansSinhala-Bold.ttf")
-        )
+        paragraph_transformer = keep_paragraph
         column_1_offset = 0
         column_2_offset = half_page_width
-    elif args.language == "ta":
+    elif language == "ta":
         text_alignment = TA_LEFT
         text_transformer = lambda x: x
-        paragraph_transformer = lambda x: x
-        pdfmetrics.registerFont(
-            TTFont("Font-light", "assets/fonts/tamil/NotoSans_NotoSansTamil-Light.ttf")
-        )
-        pdfmetrics.registerFont(
-            TTFont("Font-bold", "assets/fonts/tamil/NotoSans_NotoSansTamil-Bold.ttf")
-        )
+        paragraph_transformer = keep_paragraph
+        column_1_offset = 0
+        column_2_offset = half_page_width
+    elif language == "hi":
+        text_alignment = TA_LEFT
+        text_transformer = lambda x: x
+        paragraph_transformer = keep_paragraph
+        # Devanagari conjuncts and vowel signs need OpenType shaping
+        shaping = 1
         column_1_offset = 0
         column_2_offset = half_page_width
 
+    with profiler.stage("font preparation"):
+        light_font, bold_font = prepare_fonts(
+            language, text_transformer=text_transformer, subset_fonts=subset_fonts,
+        )
+        light_font_name, bold_font_name = register_font(light_font), register_font(bold_font)
 
-    # Initialize Translation routines
-    i18n.set("locale", args.language)
-    i18n.load_path.append(
-        os.path.join(os.path.abspath(os.path.dirname(__file__)), "translations")
-    )
-    i18n.set("filename_format", "{locale}.{format}")
-    i18n.set("file_format", "json")
-    _ = lambda text_id, prefix="": text_transformer(prefix + i18n.t(text_id))
+    with profiler.stage("translation loading"):
+        translation = get_translation(language)
+    _ = lambda text_id, prefix="": prefix + text_transformer(translation(text_id))
 
-    c = canvas.Canvas("test.pdf")
+    c = canvas.Canvas(output)
 
     heading_style = ParagraphStyle(
         name="headline",
-        fontName="Font-bold",
+        fontName=bold_font_name,
         fontSize=30,
         textColor="#fca103",
         leading=34,
         alignment=text_alignment,
+        shaping=shaping,
     )
     subheading_style = ParagraphStyle(
         name="subheading",
-        fontName="Font-bold",
+        fontName=bold_font_name,
         fontSize=24,
         textColor="#333333",
         leading=28,
         alignment=text_alignment,
+        shaping=shaping,
     )
     text_style = ParagraphStyle(
         name="text",
-        fontName="Font-light",
+        fontName=light_font_name,
         fontSize=16,
         textColor="#333333",
         leading=20,
         alignment=text_alignment,
+        shaping=shaping,
     )
     bold_text_style = ParagraphStyle(
         name="text",
-        fontName="Font-bold",
+        fontName=bold_font_name,
         fontSize=16,
         textColor="#333333",
         leading=20,
         alignment=text_alignment,
+        shaping=shaping,
     )
     footnote_yellow_style = ParagraphStyle(
         name="footnote",
-        fontName="Font-light",
+        fontName=light_font_name,
         fontSize=12,
         textColor="#fca103",
         leading=16,
         alignment=text_alignment,
+        shaping=shaping,
     )
     footnote_red_style = ParagraphStyle(
         name="footnote",
-        fontName="Font-light",
+        fontName=light_font_name,
         fontSize=12,
         textColor="#a30234",
         leading=16,
         alignment=text_alignment,
+        shaping=shaping,
     )
     left_aligned_text_style = ParagraphStyle(
         name="text",
-        fontName="Font-light",
+        fontName=light_font_name,
         fontSize=16,
         textColor="#333333",
         leading=20,
         alignment=TA_LEFT,
+        shaping=shaping,
     )
 
     content_width = half_page_width - inch * 0.2 - inch * 0.2
@@ -216,65 +237,68 @@ def main():
     )
 
     # Draw title
-    p = Paragraph(_("main-title"), style=heading_style)
-    eW, eH = p.wrap(content_width, page_height - 2 * MARGIN)
-    paragraph_transformer(p)
-    p.drawOn(
-        c, MARGIN + column_1_offset + inch * 0.2, page_height - MARGIN - eH - inch * 0.2
+    p, (eW, eH) = layout_paragraph(
+        _(cover_texts["title"][0]), heading_style, content_width, page_height - 2 * MARGIN,
+        paragraph_transformer,
+    )
+    draw_paragraph(
+        p, c, MARGIN + column_1_offset + inch * 0.2, page_height - MARGIN - eH - inch * 0.2
     )
 
     # Draw disclaimer
-    p = Paragraph(_("disclaimer"), style=footnote_yellow_style)
-    eW, eH = p.wrap(content_width, page_height - 2 * MARGIN)
-    paragraph_transformer(p)
-    p.drawOn(c, MARGIN + column_1_offset + inch * 0.2, MARGIN + inch * 0.2)
+    p, (eW, eH) = layout_paragraph(
+        _(cover_texts["disclaimer"][0]), footnote_yellow_style, content_width, page_height - 2 * MARGIN,
+        paragraph_transformer,
+    )
+    draw_paragraph(p, c, MARGIN + column_1_offset + inch * 0.2, MARGIN + inch * 0.2)
 
     # Draw cover text
     usedH = 0
-    p = Paragraph(_("preparation-title"), style=subheading_style)
-    eW, eH = p.wrap(content_width, page_height - 2 * MARGIN)
-    paragraph_transformer(p)
-    p.drawOn(c, column_2_offset + MARGIN + inch * 0.2, page_height - MARGIN - eH)
+    p, (eW, eH) = layout_paragraph(
+        _(cover_texts["preparation-title"][0]), subheading_style, content_width, page_height - 2 * MARGIN,
+        paragraph_transformer,
+    )
+    draw_paragraph(p, c, column_2_offset + MARGIN + inch * 0.2, page_height - MARGIN - eH)
     usedH = eH
 
     preparation_text = "".join(
         [
-            _("time-text"),
+            _(cover_texts["time"][0]),
             "<br/><br/>",
-            "• " + _("preparation-text-1") + "<br/>",
-            "• " + _("preparation-text-2") + "<br/>",
-            "• " + _("preparation-text-3") + "<br/>",
-            "• " + _("preparation-text-4") + "<br/>",
-            "• " + _("preparation-text-5") + "<br/>",
         ]
+        + ["• " + _(key) + "<br/>" for key in cover_texts["preparation"]]
+    )
+    p, (eW, eH) = layout_paragraph(
+        preparation_text, text_style, content_width, page_height - 2 * MARGIN,
+        paragraph_transformer,
     )
-    p = Paragraph(preparation_text, style=text_style)
-    eW, eH = p.wrap(content_width, page_height - 2 * MARGIN)
-    paragraph_transformer(p)
-    p.drawOn(
+    draw_paragraph(
+        p,
         c,
         column_2_offset + MARGIN + inch * 0.2,
         page_height - MARGIN - eH - usedH - inch * 0.2,
     )
     usedH += eH + inch * 0.5
 
-    p = Paragraph(_("overview-title"), style=subheading_style)
-    eW, eH = p.wrap(content_width, page_height - 2 * MARGIN)
-    paragraph_transformer(p)
-    p.drawOn(
+    p, (eW, eH) = layout_paragraph(
+        _(cover_texts["overview-title"][0]), subheading_style, content_width, page_height - 2 * MARGIN,
+        paragraph_transformer,
+    )
+    draw_paragraph(
+        p,
         c,
         column_2_offset + MARGIN + inch * 0.2,
         page_height - MARGIN - eH - usedH - inch * 0.2,
     )
     usedH += eH + inch * 0.2
 
-    preparation_text = "".join(
-        ["• " + _("overview-text-1") + "<br/>", "• " + _("overview-text-2") + "<br/>",]
+    preparation_text = "".join(["• " + _(key) + "<br/>" for key in cover_texts["overview"]])
+    p, (eW, eH) = layout_paragraph(
+        preparation_text, text_style, content_width, page_height - 2 * MARGIN,
+        paragraph_transformer,
     )
-    p = Paragraph(preparation_text, style=text_style)
-    eW, eH = p.wrap(content_width, page_height - 2 * MARGIN)
-    paragraph_transformer(p)
-    p.drawOn(
+    draw_paragraph(
+        p,
         c,
         column_2_offset + MARGIN + inch * 0.2,
         page_height - MARGIN - eH - usedH - inch * 0.2,
@@ -283,130 +307,32 @@ def main():
 
     c.showPage()
 
-    page_images = [
-        f"assets/lowres-nas-page{page_number}.jpg" for page_number in range(1, 8)
-    ] + [f"assets/lowres-portal-page{page_number}.jpg" for page_number in range(1, 7)]
+    page_screenshots = prepare_screenshots(half_page_width / inch, dpi=image_dpi)
 
     # Format: [(type, text)]
     page_texts = [
         [
-            ("title", _("nas-title")),
-            (
-                "bullet",
-                _("nas-page1-text1", prefix="• ").replace(
-                    "<NAS_URL>",
-                    '<br/><a href="https://www.nas.gov.qa/self-service/" color="blue"> https://www.nas.gov.qa/ </a>',
-                ),
-            ),
-            ("bullet", _("nas-page1-text2", prefix="• ")),
-            ("footnote", _("nas-page1-footnote")),
-        ],
-        [
-            ("title", _("nas-title")),
-            ("bullet", _("nas-page2-text1", prefix="• ")),
-            ("bullet", _("nas-page2-text2", prefix="• ")),
-        ],
-        [
-            ("title", _("nas-title")),
-            ("bullet", _("nas-page3-text1", prefix="• ")),
-            ("bullet", _("nas-page3-text2", prefix="• ")),
-            ("bullet", _("nas-page3-text3", prefix="• ")),
-            ("bullet", _("nas-page3-text4", prefix="• ")),
-        ],
-        [
-            ("title", _("nas-title")),
-            ("bullet", _("nas-page4-text1", prefix="• ")),
-            ("bullet", _("nas-page4-text2", prefix="• ")),
-        ],
-        [
-            ("title", _("nas-title")),
-            ("bullet", _("nas-page5-text1", prefix="• ")),
-            ("bullet", _("nas-page5-text2", prefix="• ")),
-            ("bullet", _("nas-page5-text3", prefix="• ")),
-            ("bullet", _("nas-page5-text4", prefix="• ")),
-            ("bullet", _("nas-page5-text5", prefix="• ")),
-            ("bullet", _("nas-page5-text6", prefix="• ")),
-            ("bullet", _("nas-page5-text7", prefix="• ")),
-            ("bullet", _("nas-page5-text8", prefix="• ")),
-            ("bullet", _("nas-page5-text9", prefix="• ")),
-            ("bullet", _("nas-page5-text10", prefix="• ")),
-            ("bullet", _("nas-page5-text11", prefix="• ")),
-            ("bullet", _("nas-page5-text12", prefix="• ")),
-        ],
-        [
-            ("title", _("nas-title")),
-            ("bullet", _("nas-page6-text1", prefix="• ")),
-            ("bullet", _("nas-page6-text2", prefix="• ")),
-            ("bullet", _("nas-page6-text3", prefix="• ")),
-        ],
-        [
-            ("title", _("nas-title")),
-            ("bullet", _("nas-page7-text1", prefix="• ")),
-            ("footnote", _("nas-page7-footnote")),
-        ],
-        [
-            ("title", _("vaccineportal-title")),
             (
-                "bullet",
-                _("vaccineportal-page1-text1", prefix="• ").replace(
-                    "<PORTAL_URL>",
-                    '<a href="http://app-covid19.moph.gov.qa" color="blue">http://app-covid19.moph.gov.qa</a>',
+                text_type,
+                replace_links(
+                    _(key, prefix="• " if text_type == "bullet" else ""),
+                    manifest.links["reportlab"],
                 ),
-            ),
-            ("bullet", _("vaccineportal-page1-text2", prefix="• ")),
-            ("footnote", _("vaccineportal-page1-footnote")),
-        ],
-        [
-            ("title", _("vaccineportal-title")),
-            ("bullet", _("vaccineportal-page2-text1", prefix="• ")),
-            ("bullet", _("vaccineportal-page2-text2", prefix="• ")),
-            ("bullet", _("vaccineportal-page2-text3", prefix="• ")),
-        ],
-        [
-            ("title", _("vaccineportal-title")),
-            ("bullet", _("vaccineportal-page3-text1", prefix="• ")),
-            ("bullet", _("vaccineportal-page3-text2", prefix="• ")),
-            ("bullet", _("vaccineportal-page3-text3", prefix="• ")),
-            ("bullet", _("vaccineportal-page3-text4", prefix="• ")),
-        ],
-        [
-            ("title", _("vaccineportal-title")),
-            ("bullet", _("vaccineportal-page4-text1", prefix="• ")),
-            ("bullet", _("vaccineportal-page4-text2", prefix="• ")),
-            ("bullet", _("vaccineportal-page4-text3", prefix="• ")),
-            ("bullet", _("vaccineportal-page4-text4", prefix="• ")),
-            ("bullet", _("vaccineportal-page4-text5", prefix="• ")),
-        ],
-        [
-            ("title", _("vaccineportal-title")),
-            ("bullet", _("vaccineportal-page5-text1", prefix="• ")),
-            ("bullet", _("vaccineportal-page5-text2", prefix="• ")),
-            ("bullet", _("vaccineportal-page5-text3", prefix="• ")),
-            ("bullet", _("vaccineportal-page5-text4", prefix="• ")),
-            ("bullet", _("vaccineportal-page5-text5", prefix="• ")),
-            ("bullet", _("vaccineportal-page5-text6", prefix="• ")),
-            ("bullet", _("vaccineportal-page5-text7", prefix="• ")),
-            ("bullet", _("vaccineportal-page5-text8", prefix="• ")),
-            ("bullet", _("vaccineportal-page5-text9", prefix="• ")),
-            ("footnote", _("vaccineportal-page5-footnote")),
-        ],
-        [
-            ("title", _("vaccineportal-title")),
-            ("bullet", _("vaccineportal-page6-text1", prefix="• ")),
-        ],
+            )
+            for text_type, key in page.texts
+        ]
+        for page in guide_pages(manifest)
     ]
 
-    for page_idx, page_image in enumerate(page_images):
-        page_screenshot = Image.open(page_image)
-        screenshot_width, screenshot_height = page_screenshot.size
+    for page_idx, (page_image, (screenshot_width, screenshot_height)) in enumerate(page_screenshots):
         resize_ratio = (half_page_width) / screenshot_width
 
         page_height = screenshot_height * resize_ratio + MARGIN * 2
         c.setPageSize((page_width, page_height))
 
         # draw screenshot
-        c.drawInlineImage(
-            page_screenshot,
+        c.drawImage(
+            get_image_reader(page_image),
             MARGIN + column_1_offset,
             MARGIN,
             half_page_width,
@@ -419,25 +345,28 @@ def main():
         usedH = MARGIN
         for text_type, text in page_texts[page_idx]:
             if text_type == "title":
-                p = Paragraph(text, style=subheading_style)
-                eW, eH = p.wrap(content_width, page_height - 2 * MARGIN)
-                paragraph_transformer(p)
+                p, (eW, eH) = layout_paragraph(
+                    text, subheading_style, content_width, page_height - 2 * MARGIN,
+                    paragraph_transformer,
+                )
                 y = page_height - usedH - eH
                 usedH += eH + 0.2 * inch
             elif text_type == "bullet":
-                p = Paragraph(text, style=text_style)
-                eW, eH = p.wrap(content_width, page_height - 2 * MARGIN)
-                paragraph_transformer(p)
+                p, (eW, eH) = layout_paragraph(
+                    text, text_style, content_width, page_height - 2 * MARGIN,
+                    paragraph_transformer,
+                )
                 y = page_height - usedH - eH
                 usedH += eH + 0.1 * inch
             elif text_type == "footnote":
-                p = Paragraph(text, style=footnote_red_style)
-                eW, eH = p.wrap(content_width, page_height - 2 * MARGIN)
-                paragraph_transformer(p)
+                p, (eW, eH) = layout_paragraph(
+                    text, footnote_red_style, content_width, page_height - 2 * MARGIN,
+                    paragraph_transformer,
+                )
                 y = MARGIN + inch * 0.2
                 usedH += eH
 
-            p.drawOn(c, column_2_offset + MARGIN + inch * 0.2, y)
+            draw_paragraph(p, c, column_2_offset + MARGIN + inch * 0.2, y)
 
         c.showPage()
 
@@ -453,73 +382,76 @@ def main():
         page_height - 2 * MARGIN,
         fill=1,
     )
-    p = Paragraph(_("end-title"), style=heading_style)
-    eW, eH = p.wrap(content_width, page_height - 2 * MARGIN)
-    paragraph_transformer(p)
-    p.drawOn(
-        c, MARGIN + column_1_offset + inch * 0.2, page_height - MARGIN - eH - inch * 0.2
+    p, (eW, eH) = layout_paragraph(
+        _(end_texts["title"][0]), heading_style, content_width, page_height - 2 * MARGIN,
+        paragraph_transformer,
+    )
+    draw_paragraph(
+        p, c, MARGIN + column_1_offset + inch * 0.2, page_height - MARGIN - eH - inch * 0.2
     )
 
-    p = Paragraph(
-        f"v{datetime.datetime.now().strftime('%Y%m%d')}", style=footnote_yellow_style
+    p, (eW, eH) = layout_paragraph(
+        f"v{datetime.datetime.now().strftime('%Y%m%d')}", footnote_yellow_style, content_width, page_height - 2 * MARGIN,
+        paragraph_transformer,
     )
-    eW, eH = p.wrap(content_width, page_height - 2 * MARGIN)
-    paragraph_transformer(p)
-    p.drawOn(c, MARGIN + column_1_offset + inch * 0.2, MARGIN + inch * 0.2)
+    draw_paragraph(p, c, MARGIN + column_1_offset + inch * 0.2, MARGIN + inch * 0.2)
 
     usedH = 0
-    p = Paragraph(_("contributors-title"), style=subheading_style)
-    eW, eH = p.wrap(content_width, page_height - 2 * MARGIN)
-    paragraph_transformer(p)
-    p.drawOn(c, column_2_offset + MARGIN + inch * 0.2, page_height - MARGIN - eH)
+    p, (eW, eH) = layout_paragraph(
+        _(end_texts["contributors-title"][0]), subheading_style, content_width, page_height - 2 * MARGIN,
+        paragraph_transformer,
+    )
+    draw_paragraph(p, c, column_2_offset + MARGIN + inch * 0.2, page_height - MARGIN - eH)
     usedH = eH
 
     preparation_text = "".join(
         [
-            "• " + _(f"{contributer} ({','.join(contributions)})") + "<br/>"
-            for contributer, contributions in sorted(CONTRIBUTERS, key=lambda x: x[0])
+            "• " + text_transformer(contributer_text) + "<br/>"
+            for contributer_text in contributor_texts(manifest)
         ]
     )
-    p = Paragraph(preparation_text, style=left_aligned_text_style)
-    eW, eH = p.wrap(content_width, page_height - 2 * MARGIN)
-    paragraph_transformer(p)
-    p.drawOn(
+    p, (eW, eH) = layout_paragraph(
+        preparation_text, left_aligned_text_style, content_width, page_height - 2 * MARGIN,
+        paragraph_transformer,
+    )
+    draw_paragraph(
+        p,
         c,
         column_2_offset + MARGIN + inch * 0.2,
         page_height - MARGIN - eH - usedH - inch * 0.2,
     )
     usedH += eH + inch * 0.5
 
-    p = Paragraph(_("created-title"), style=subheading_style)
-    eW, eH = p.wrap(content_width, page_height - 2 * MARGIN)
-    paragraph_transformer(p)
-    p.drawOn(
+    p, (eW, eH) = layout_paragraph(
+        _(end_texts["created-title"][0]), subheading_style, content_width, page_height - 2 * MARGIN,
+        paragraph_transformer,
+    )
+    draw_paragraph(
+        p,
         c,
         column_2_offset + MARGIN + inch * 0.2,
         page_height - MARGIN - eH - usedH - inch * 0.2,
     )
     usedH += eH + inch * 0.2
 
-    p = Paragraph("Fahim Dalvi", style=text_style)
-    eW, eH = p.wrap(content_width, page_height - 2 * MARGIN)
-    paragraph_transformer(p)
-    p.drawOn(
+    p, (eW, eH) = layout_paragraph(
+        manifest.creator, text_style, content_width, page_height - 2 * MARGIN,
+        paragraph_transformer,
+    )
+    draw_paragraph(
+        p,
         c,
         column_2_offset + MARGIN + inch * 0.2,
         page_height - MARGIN - eH - usedH - inch * 0.2,
     )
     usedH += eH + inch * 0.2
 
-    p = Paragraph(
-        _("contribution-note").replace(
-            "<CONTACT_EMAIL>",
-            '<a href="mailto:fdalvi.vaccine.guide@protonmail.com" color="blue">fdalvi.vaccine.guide@protonmail.com</a>',
-        ),
-        style=footnote_red_style,
+    p, (eW, eH) = layout_paragraph(
+        replace_links(_(end_texts["contribution-note"][0]), manifest.links["reportlab"]), footnote_red_style, content_width, page_height - 2 * MARGIN,
+        paragraph_transformer,
     )
-    eW, eH = p.wrap(content_width, page_height - 2 * MARGIN)
-    paragraph_transformer(p)
-    p.drawOn(
+    draw_paragraph(
+        p,
         c,
         column_2_offset + MARGIN + inch * 0.2,
         page_height - MARGIN - eH - usedH - inch * 0.2,
@@ -528,7 +460,75 @@ def main():
 
     c.showPage()
 
-    c.save()
+    with profiler.stage("save"):
+        c.save()
+
+    if language == "ur":
+        urdu.save_urdu_cache()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument(
+        "-l",
+        "--language",
+        default="en",
+        choices=LANGUAGES.keys(),
+        help="Locale to generate the guide in",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        required=True,
+        help="Output pdf name",
+    )
+    parser.add_argument(
+        "--no-font-subset",
+        action="store_true",
+        help="Embed the full fonts instead of subsets with only the glyphs used by the guide",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Record the time and memory use of every build stage",
+    )
+    parser.add_argument(
+        "--profile-memory",
+        action="store_true",
+        help="Also record the peak Python allocations of every build stage, implies "
+             "--profile. Tracing allocations slows Python code down several times, "
+             "so stage times are not comparable",
+    )
+    parser.add_argument(
+        "--profile-dir",
+        default="profile",
+        help="Directory to write the profiling report to",
+    )
+    parser.add_argument(
+        "--image-dpi",
+        type=int,
+        default=DEFAULT_DPI,
+        help="Resolution to resize the screenshots to",
+    )
+    args = parser.parse_args()
+
+    profiler.enabled = args.profile or args.profile_memory
+    profiler.trace_memory = args.profile_memory
+
+    if not run_preflight([args.language]):
+        sys.exit(1)
+
+    build_guide(
+        args.language,
+        args.output,
+        subset_fonts=not args.no_font_subset,
+        image_dpi=args.image_dpi,
+    )
+
+    if profiler.enabled:
+        profiler.write_reports(args.profile_dir)
+        print(profiler.summary())
 
 
 if __name__ == "__main__":
@@ -0,0 +1,139 @@
+import hashlib
+import json
+import os
+import string
+import tempfile
+
+from locales import load_translations
+from page_cache import file_hash
+from page_manifest import contributor_texts, link_texts, load_manifest
+from profiling import timed_import
+
+FONT_CACHE_DIR = ".cache/fonts"
+
+# Format: {locale: (light font, bold font)}
+LOCALE_FONTS = {
+    "en": (
+        "assets/fonts/roboto-android/Roboto-Light.ttf",
+        "assets/fonts/roboto-android/Roboto-Bold.ttf",
+    ),
+    "ur": (
+        "assets/fonts/urdu/Roboto_NotoNaskhArabic-Regular.ttf",
+        "assets/fonts/urdu/Roboto_NotoNaskhArabic-Bold.ttf",
+    ),
+    "ta": (
+        "assets/fonts/tamil/NotoSans_NotoSansTamil-Light.ttf",
+        "assets/fonts/tamil/NotoSans_NotoSansTamil-Bold.ttf",
+    ),
+    "si": (
+        "assets/fonts/sinhala/NotoSans_NotoSansSinhala-Light.ttf",
+        "assets/fonts/sinhala/NotoSans_NotoSansSinhala-Bold.ttf",
+    ),
+    "hi": (
+        "assets/fonts/hindi/NotoSans_NotoSansDevanagari-Light.ttf",
+        "assets/fonts/hindi/NotoSans_NotoSansDevanagari-Bold.ttf",
+    ),
+}
+
+# Text that is not part of the translations or the manifest but still ends up
+# on the pages, e.g. the version date and bullets
+FIXED_TEXT = string.printable + "•"
+
+
+def used_codepoints(language, text_transformer=None):
+    """
+    Every codepoint that can end up on a page of the `language` guide. If the
+    renderer transforms text before drawing it (e.g. Urdu reshaping to
+    presentation forms), pass the transform as `text_transformer`.
+    """
+    manifest = load_manifest()
+    texts = list(load_translations(language).values())
+    texts += [link_text for _, link_text in link_texts(manifest)]
+    texts += contributor_texts(manifest) + [manifest.creator]
+    texts.append(FIXED_TEXT)
+    if text_transformer is not None:
+        texts = [text_transformer(text) for text in texts]
+    return frozenset(ord(char) for text in texts for char in text)
+
+
+def font_codepoints(font_path, cache_dir=FONT_CACHE_DIR):
+    """
+    Codepoints covered by the cmap of `font_path`. Cached on disk keyed by
+    the font contents, so checks do not need to parse the font again.
+    """
+    cache_path = os.path.join(cache_dir, f"cmap-{file_hash(font_path)[:16]}.json")
+    if os.path.exists(cache_path):
+        with open(cache_path) as fp:
+            return frozenset(json.load(fp))
+
+    ttLib = timed_import("fontTools.ttLib")
+    with ttLib.TTFont(font_path, lazy=True) as font:
+        codepoints = sorted(font.getBestCmap())
+
+    os.makedirs(cache_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".json")
+    with os.fdopen(fd, "w") as fp:
+        json.dump(codepoints, fp)
+    os.replace(tmp_path, cache_path)
+    return frozenset(codepoints)
+
+
+def subset_font(font_path, codepoints, flavor=None, cache_dir=FONT_CACHE_DIR):
+    """
+    Subset `font_path` down to the glyphs needed for `codepoints`. Layout
+    tables are kept so complex scripts still shape correctly. Subsets are
+    cached on disk keyed by the font contents and the codepoint set, so a
+    translation change that adds no new characters reuses the previous subset.
+    Pass "woff2" as `flavor` to compress the subset for the web.
+    """
+    key = hashlib.sha256()
+    key.update(file_hash(font_path).encode("utf-8"))
+    key.update(",".join(str(codepoint) for codepoint in sorted(codepoints)).encode("utf-8"))
+    font_name, font_extension = os.path.splitext(os.path.basename(font_path))
+    if flavor is not None:
+        key.update(flavor.encode("utf-8"))
+        font_extension = f".{flavor}"
+    subset_path = os.path.join(cache_dir, f"{font_name}-{key.hexdigest()[:16]}{font_extension}")
+    if os.path.exists(subset_path):
+        return subset_path
+
+    subset = timed_import("fontTools.subset")
+    options = subset.Options()
+    options.layout_features = ["*"]
+    options.name_IDs = ["*"]
+    options.name_languages = ["*"]
+    options.notdef_outline = True
+    options.hinting = False
+    # FontForge timestamps, fontTools does not know how to subset them
+    options.drop_tables += ["FFTM"]
+    options.flavor = flavor
+
+    font = subset.load_font(font_path, options)
+    subsetter = subset.Subsetter(options)
+    subsetter.populate(unicodes=codepoints)
+    subsetter.subset(font)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=font_extension)
+    os.close(fd)
+    subset.save_font(font, tmp_path, options)
+    os.replace(tmp_path, subset_path)
+    return subset_path
+
+
+def prepare_fonts(language, text_transformer=None, subset_fonts=True, flavor=None):
+    """
+    (light font, bold font) paths for `language`, subsetted if requested and
+    converted to `flavor` (e.g. "woff2") if given
+    """
+    if not subset_fonts:
+        if flavor is None:
+            return LOCALE_FONTS[language]
+        # Keep every glyph, only convert
+        return tuple(
+            subset_font(font_path, font_codepoints(font_path), flavor=flavor)
+            for font_path in LOCALE_FONTS[language]
+        )
+
+    codepoints = used_codepoints(language, text_transformer)
+    return tuple(subset_font(font_path, codepoints, flavor=flavor) for font_path in LOCALE_FONTS[language])
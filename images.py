@@ -0,0 +1,112 @@
+import hashlib
+import json
+import os
+import tempfile
+
+from page_cache import file_hash
+from page_manifest import guide_pages, load_manifest
+from profiling import profiler, timed_import
+
+IMAGE_CACHE_DIR = ".cache/images"
+
+# The checked in lowres screenshots are 300px wide at ~3.5in, i.e. ~85 DPI
+DEFAULT_DPI = 85
+JPEG_QUALITY = 85
+
+
+def load_image_index(cache_dir=IMAGE_CACHE_DIR):
+    index_path = os.path.join(cache_dir, "index.json")
+    if not os.path.exists(index_path):
+        return {}
+    with open(index_path) as fp:
+        return json.load(fp)
+
+
+def save_image_index(index, cache_dir=IMAGE_CACHE_DIR):
+    os.makedirs(cache_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".json")
+    with os.fdopen(fd, "w") as fp:
+        json.dump(index, fp, indent=4)
+    os.replace(tmp_path, os.path.join(cache_dir, "index.json"))
+
+
+def prepare_screenshot(source_path, target_width, index, cache_dir=IMAGE_CACHE_DIR):
+    """
+    Resize `source_path` to `target_width` pixels and return the path and size
+    of the resized copy. Resized copies are cached by the source contents and
+    target width, and their sizes are recorded in `index` so cache hits never
+    have to open the image.
+    """
+    key = hashlib.sha256(
+        f"{file_hash(source_path)}:{target_width}:{JPEG_QUALITY}".encode("utf-8")
+    ).hexdigest()[:16]
+    image_name, image_extension = os.path.splitext(os.path.basename(source_path))
+    resized_path = os.path.join(cache_dir, f"{image_name}-{key}{image_extension}")
+
+    if key in index and os.path.exists(resized_path):
+        return resized_path, tuple(index[key])
+
+    Image = timed_import("PIL.Image")
+    with profiler.stage("PIL image open", detail=source_path), Image.open(source_path) as screenshot:
+        width, height = screenshot.size
+        target_height = round(height * target_width / width)
+        resized_screenshot = screenshot.convert("RGB").resize(
+            (target_width, target_height), Image.LANCZOS
+        )
+
+    os.makedirs(cache_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=image_extension)
+    os.close(fd)
+    resized_screenshot.save(tmp_path, "JPEG", quality=JPEG_QUALITY, optimize=True)
+    os.replace(tmp_path, resized_path)
+
+    index[key] = [target_width, target_height]
+    return resized_path, (target_width, target_height)
+
+
+def prepare_screenshots(width_in, dpi=DEFAULT_DPI, cache_dir=IMAGE_CACHE_DIR):
+    """
+    Screenshots for every guide page in manifest order, resized to `dpi` at
+    `width_in` inches. Format: [(path, (width, height))]
+    """
+    target_width = round(width_in * dpi)
+    index = load_image_index(cache_dir)
+    index_size = len(index)
+
+    page_screenshots = [
+        prepare_screenshot(page.image, target_width, index, cache_dir)
+        for page in guide_pages(load_manifest())
+    ]
+
+    if len(index) != index_size:
+        save_image_index(index, cache_dir)
+    return page_screenshots
+
+
+def lowres_path(image_path):
+    """The checked in lowres copy of the full resolution screenshot `image_path`"""
+    image_dir, image_name = os.path.split(image_path)
+    return os.path.join(image_dir, f"lowres-{image_name}")
+
+
+def prepare_srcset(image_path, cache_dir=IMAGE_CACHE_DIR):
+    """
+    Candidates for a responsive <img> of the screenshot `image_path`, from
+    smallest to largest: its lowres copy, the full resolution screenshot
+    resized to twice the lowres width, and the full resolution screenshot
+    itself. Format: [(path, (width, height))]
+    """
+    Image = timed_import("PIL.Image")
+    candidates = []
+    for source_path in [lowres_path(image_path), image_path]:
+        with Image.open(source_path) as screenshot:
+            candidates.append((source_path, screenshot.size))
+
+    (_, (lowres_width, _)), (_, (full_width, _)) = candidates
+    if 2 * lowres_width < full_width:
+        index = load_image_index(cache_dir)
+        index_size = len(index)
+        candidates.insert(1, prepare_screenshot(image_path, 2 * lowres_width, index, cache_dir))
+        if len(index) != index_size:
+            save_image_index(index, cache_dir)
+    return candidates
@@ -0,0 +1,71 @@
+import functools
+import json
+import os
+import types
+
+from page_manifest import load_manifest
+
+TRANSLATIONS_DIR = os.path.join(os.path.abspath(os.path.dirname(__file__)), "translations")
+
+LANGUAGES = {
+    "en": "english",
+    "ur": "urdu",
+    "ta": "tamil",
+    "si": "sinhala",
+    "hi": "hindi",
+}
+
+HINDI_TRANFORMS = {
+    '\u0915\u0947 ': '\u0915\u0947\u2002',
+    '\u0930\u094d\u0915 ': '\u0930\u094d\u0915\u2002'
+}
+
+
+def text_transformer(text, transforms):
+    for k, v in transforms.items():
+        text = text.replace(k, v)
+    return text
+
+
+def translation_transformer(language):
+    if language == 'hi':
+        return lambda text: text_transformer(text, HINDI_TRANFORMS)
+    return None
+
+
+def read_translations(language):
+    """Raw {key: text} translations of `language`, as stored in the file"""
+    with open(os.path.join(TRANSLATIONS_DIR, f"{language}.json"), encoding="utf-8") as fp:
+        return json.load(fp)[language]
+
+
+def used_keys():
+    """Every translation key used by the pages"""
+    return {key for page in load_manifest().pages for key in page.keys}
+
+
+@functools.lru_cache(maxsize=None)
+def load_translations(language):
+    """
+    Translations of `language` as a read-only {key: text} mapping. The file is
+    only read once per process and the locale's text transforms are applied
+    here instead of on every lookup. Raises a ValueError if any key used by
+    the pages is missing.
+    """
+    translations = read_translations(language)
+
+    missing_keys = sorted(used_keys() - set(translations))
+    if missing_keys:
+        raise ValueError(
+            f"translations/{language}.json is missing keys: {', '.join(missing_keys)}"
+        )
+
+    transformer = translation_transformer(language)
+    if transformer is not None:
+        translations = {key: transformer(text) for key, text in translations.items()}
+    return types.MappingProxyType(translations)
+
+
+def get_translation(language):
+    """`translation(text_id)` lookup for `language`"""
+    return load_translations(language).__getitem__
@@ -0,0 +1,128 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+
+# Bump this whenever the way pages are rendered changes in a way that is not
+# captured by the page HTML or the pdfkit options
+CACHE_VERSION = 1
+
+# Local files referenced from the generated HTML, i.e. screenshots and fonts
+REFERENCED_FILE_PATTERN = re.compile(r'(?:src=|url\()"([^"]+)"')
+
+_file_hashes = {}
+_file_hashes_lock = threading.Lock()
+
+
+def file_hash(path):
+    stat = os.stat(path)
+    cache_key = (path, stat.st_size, stat.st_mtime_ns)
+    with _file_hashes_lock:
+        if cache_key in _file_hashes:
+            return _file_hashes[cache_key]
+    with open(path, "rb") as fp:
+        digest = hashlib.sha256(fp.read()).hexdigest()
+    with _file_hashes_lock:
+        _file_hashes[cache_key] = digest
+    return digest
+
+
+def output_mode(path):
+    """
+    Permissions for a file written to `path` through a temporary file, which
+    is only readable by its owner: those of the file it replaces, or the
+    default for new files
+    """
+    if os.path.exists(path):
+        return os.stat(path).st_mode & 0o777
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+def page_key(html, options):
+    """
+    Hash of everything that goes into rendering a page with wkhtmltopdf: the
+    page HTML (and hence the translated strings and doc style), the pdfkit
+    options, the user style sheet and every local file referenced from the
+    HTML, i.e. screenshots and fonts.
+    """
+    hasher = hashlib.sha256()
+    hasher.update(f"v{CACHE_VERSION}\n".encode("utf-8"))
+    hasher.update(html.encode("utf-8"))
+    hasher.update(json.dumps(options, sort_keys=True).encode("utf-8"))
+
+    referenced_files = set(REFERENCED_FILE_PATTERN.findall(html))
+    if options.get("user-style-sheet"):
+        referenced_files.add(options["user-style-sheet"])
+    for path in sorted(referenced_files):
+        if os.path.isfile(path):
+            hasher.update(f"{path}:{file_hash(path)}\n".encode("utf-8"))
+
+    return hasher.hexdigest()
+
+
+class PageCache:
+    """
+    On-disk cache of rendered page PDFs, keyed by `page_key`. Entries are
+    evicted in least recently used order once the cache grows beyond
+    `max_size` bytes.
+    """
+
+    def __init__(self, cache_dir, max_size):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, html, options):
+        return page_key(html, options)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.pdf")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as fp:
+                data = fp.read()
+        except FileNotFoundError:
+            return None
+
+        # Mark the entry as recently used
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return data
+
+    def put(self, key, data):
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "wb") as fp:
+            fp.write(data)
+        os.replace(tmp_path, self._path(key))
+        self.evict()
+
+    def evict(self):
+        with self._lock:
+            entries = []
+            for entry in os.scandir(self.cache_dir):
+                if not entry.name.endswith(".pdf"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+            total_size = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total_size <= self.max_size:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total_size -= size
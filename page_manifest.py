@@ -0,0 +1,121 @@
+import collections
+import functools
+import json
+import os
+
+MANIFEST_PATH = os.path.join(os.path.abspath(os.path.dirname(__file__)), "pages.json")
+
+# name: unique page name
+# image: screenshot path for guide pages, None for the cover and end pages
+# texts: [(type, translation key)] for guide pages, laid out in order
+# keys: every translation key the page depends on
+ManifestPage = collections.namedtuple("ManifestPage", ["name", "image", "texts", "keys"])
+
+# before: markup in front of the link, e.g. a line break
+Link = collections.namedtuple("Link", ["href", "text", "before"])
+
+# Link markup can differ per renderer, e.g. reportlab needs a line break before
+# a long URL that wkhtmltopdf wraps by itself
+RENDERERS = ["wkhtmltopdf", "reportlab"]
+
+# links: {renderer: {placeholder: Link}}
+Manifest = collections.namedtuple(
+    "Manifest", ["pages", "links", "creator", "contributors", "key_pages", "image_pages"]
+)
+
+
+@functools.lru_cache(maxsize=None)
+def load_manifest(path=MANIFEST_PATH):
+    """
+    Load and compile the page manifest shared by both renderers. The compiled
+    form is cached for the lifetime of the process, so building several locales
+    in one run only parses it once.
+    """
+    with open(path, encoding="utf-8") as fp:
+        raw_manifest = json.load(fp)
+
+    pages = []
+    key_pages = collections.defaultdict(list)
+    image_pages = collections.defaultdict(list)
+    for page_idx, raw_page in enumerate(raw_manifest["pages"]):
+        texts = tuple((text_type, key) for text_type, key in raw_page.get("texts", []))
+        keys = tuple(raw_page.get("keys", [])) + tuple(
+            key for _, key in texts if key not in raw_page.get("keys", [])
+        )
+        page = ManifestPage(raw_page["name"], raw_page.get("image"), texts, keys)
+        pages.append(page)
+
+        for key in set(keys):
+            key_pages[key].append(page_idx)
+        if page.image:
+            image_pages[page.image].append(page_idx)
+
+    links = {
+        renderer: {
+            placeholder: Link(
+                link["href"],
+                link.get(renderer, {}).get("text", link["text"]),
+                link.get(renderer, {}).get("before", ""),
+            )
+            for placeholder, link in raw_manifest["links"].items()
+        }
+        for renderer in RENDERERS
+    }
+
+    # Format: ((name, (contribution, ...)), ...)
+    contributors = tuple(
+        (contributor["name"], tuple(contributor["contributions"]))
+        for contributor in raw_manifest["contributors"]
+    )
+
+    return Manifest(
+        tuple(pages), links, raw_manifest["creator"], contributors, dict(key_pages), dict(image_pages)
+    )
+
+
+def guide_pages(manifest):
+    return [page for page in manifest.pages if page.image]
+
+
+def page_text_keys(manifest, name):
+    """Translation keys of the page `name` by text type. Format: {type: [key]}"""
+    (page,) = [page for page in manifest.pages if page.name == name]
+    texts = collections.defaultdict(list)
+    for text_type, key in page.texts:
+        texts[text_type].append(key)
+    return texts
+
+
+def link_texts(manifest):
+    """Format: [(placeholder, link text)] of every renderer"""
+    return sorted({
+        (placeholder, link.text)
+        for links in manifest.links.values()
+        for placeholder, link in links.items()
+    })
+
+
+def pages_for_keys(manifest, keys):
+    """Indices of the pages that need re-rendering when `keys` change"""
+    return sorted({page_idx for key in keys for page_idx in manifest.key_pages.get(key, [])})
+
+
+def pages_for_images(manifest, images):
+    """Indices of the pages that need re-rendering when `images` change"""
+    return sorted(
+        {page_idx for image in images for page_idx in manifest.image_pages.get(image, [])}
+    )
+
+
+def contributor_texts(manifest):
+    """Contributor lines for the end page, sorted by name"""
+    return [
+        f"{contributor} ({','.join(contributions)})"
+        for contributor, contributions in sorted(manifest.contributors, key=lambda x: x[0])
+    ]
+
+
+def replace_links(text, links):
+    for placeholder, link in links.items():
+        text = text.replace(placeholder, f'{link.before}<a href="{link.href}" color="blue">{link.text}</a>')
+    return text
@@ -0,0 +1,119 @@
+import hashlib
+import os
+import tempfile
+
+from page_cache import output_mode
+from profiling import timed_import
+
+# Objects that belong to one place in the document and must never be shared,
+# even if two of them happen to be identical
+UNSHARED_TYPES = {"/Page", "/Pages", "/Catalog", "/Annot", "/Outlines"}
+
+
+def object_key(pikepdf, obj):
+    """Hash of everything that makes `obj` what it is, or None if it cannot be shared"""
+    if isinstance(obj, pikepdf.Stream):
+        stream_dict = {key: value for key, value in obj.stream_dict.items() if key != "/Length"}
+        if stream_dict.get("/Type") in UNSHARED_TYPES:
+            return None
+        key = hashlib.sha256(b"stream")
+        key.update(pikepdf.Dictionary(stream_dict).unparse())
+        key.update(obj.read_raw_bytes())
+        return key.digest()
+    if isinstance(obj, pikepdf.Dictionary):
+        if obj.get("/Type") in UNSHARED_TYPES:
+            return None
+        return hashlib.sha256(b"dictionary" + obj.unparse()).digest()
+    if isinstance(obj, pikepdf.Array):
+        return hashlib.sha256(b"array" + obj.unparse()).digest()
+    return None
+
+
+def replace_references(pikepdf, container, replacements):
+    """Point every reference in `container` at the kept copy of the object"""
+    if isinstance(container, pikepdf.Stream):
+        container = container.stream_dict
+    if isinstance(container, pikepdf.Dictionary):
+        items = list(container.items())
+    elif isinstance(container, pikepdf.Array):
+        items = list(enumerate(container))
+    else:
+        return
+
+    for key, value in items:
+        # Scalars come back as plain Python values
+        if not isinstance(value, pikepdf.Object):
+            continue
+        if value.is_indirect:
+            if value.objgen in replacements:
+                container[key] = replacements[value.objgen]
+        else:
+            replace_references(pikepdf, value, replacements)
+
+
+def dedupe_objects(pikepdf, pdf):
+    """
+    Share identical streams, dictionaries and arrays, e.g. the font programs,
+    font descriptors and images every separately rendered page carries its
+    own copy of. Runs until nothing changes, as objects only become identical
+    once the objects they reference have been shared. Returns the number of
+    objects removed.
+    """
+    # Replaced objects stay in the object table until the file is saved
+    removed_objects = set()
+    while True:
+        # Format: {object key: kept object}
+        kept_objects = {}
+        # Format: {(object number, generation): kept object}
+        replacements = {}
+        for obj in pdf.objects:
+            if obj.objgen in removed_objects:
+                continue
+            key = object_key(pikepdf, obj)
+            if key is None:
+                continue
+            if key in kept_objects:
+                replacements[obj.objgen] = kept_objects[key]
+            else:
+                kept_objects[key] = obj
+
+        if not replacements:
+            return len(removed_objects)
+        removed_objects.update(replacements)
+
+        for obj in pdf.objects:
+            if obj.objgen in removed_objects:
+                continue
+            replace_references(pikepdf, obj, replacements)
+        replace_references(pikepdf, pdf.trailer, replacements)
+
+
+def optimize_pdf(path):
+    """
+    Deduplicate the objects of the pdf at `path`, compress its streams and
+    pack the remaining objects into object streams. The file is replaced
+    atomically. Returns (size before, size after) in bytes.
+    """
+    pikepdf = timed_import("pikepdf")
+    size_before = os.path.getsize(path)
+
+    output_dir = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=output_dir, suffix=".pdf")
+    os.close(fd)
+    try:
+        with pikepdf.open(path) as pdf:
+            dedupe_objects(pikepdf, pdf)
+            pdf.remove_unreferenced_resources()
+            pdf.save(
+                tmp_path,
+                compress_streams=True,
+                recompress_flate=True,
+                object_stream_mode=pikepdf.ObjectStreamMode.generate,
+                deterministic_id=True,
+            )
+        os.chmod(tmp_path, output_mode(path))
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return size_before, os.path.getsize(path)
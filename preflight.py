@@ -0,0 +1,116 @@
+import collections
+import re
+import unicodedata
+
+from fonts import LOCALE_FONTS, font_codepoints
+from locales import read_translations, translation_transformer, used_keys
+from page_manifest import contributor_texts, link_texts, load_manifest
+from profiling import profiler
+
+# Link placeholders in the translations, e.g. <NAS_URL>
+PLACEHOLDER_PATTERN = re.compile(r"<[A-Z_]+>")
+
+# Text drawn on the pages besides the translations, e.g. bullets and the
+# version date
+FIXED_TEXT = "•v0123456789"
+
+# Control and formatting characters (e.g. zero width joiners) are not drawn
+# with glyphs of their own
+UNDRAWN_CATEGORIES = {"Cc", "Cf", "Zl", "Zp"}
+
+
+def check_translations(language, reference_translations):
+    errors, warnings = [], []
+    try:
+        translations = read_translations(language)
+    except (OSError, ValueError, KeyError) as e:
+        return [f"{language}: could not read translations/{language}.json ({e})"], []
+
+    missing_keys = sorted(used_keys() - set(translations))
+    if missing_keys:
+        errors.append(f"{language}: missing keys: {', '.join(missing_keys)}")
+
+    for key in sorted(used_keys() & set(translations)):
+        text = translations[key]
+        if not text.strip():
+            errors.append(f"{language}: {key}: empty text")
+            continue
+
+        reference_text = reference_translations.get(key, "")
+        placeholders = set(PLACEHOLDER_PATTERN.findall(text))
+        reference_placeholders = set(PLACEHOLDER_PATTERN.findall(reference_text))
+        if placeholders != reference_placeholders:
+            errors.append(
+                f"{language}: {key}: links {', '.join(sorted(placeholders)) or 'none'} "
+                f"do not match {', '.join(sorted(reference_placeholders)) or 'none'}"
+            )
+
+        if text.count("(") != text.count(")") and reference_text.count("(") == reference_text.count(")"):
+            warnings.append(f"{language}: {key}: unbalanced brackets, the text may be truncated")
+    return errors, warnings
+
+
+def check_glyphs(language):
+    """Characters of the `language` guide that are missing from its fonts"""
+    manifest = load_manifest()
+    try:
+        translations = read_translations(language)
+    except (OSError, ValueError, KeyError):
+        # Already reported by check_translations
+        return []
+
+    transformer = translation_transformer(language) or (lambda text: text)
+    # Format: [(where, text)]
+    texts = [(key, transformer(translations[key])) for key in sorted(used_keys() & set(translations))]
+    texts += link_texts(manifest)
+    texts += [("contributors", text) for text in contributor_texts(manifest) + [manifest.creator]]
+    texts.append(("fixed text", FIXED_TEXT))
+
+    errors = []
+    for font_path in LOCALE_FONTS[language]:
+        covered_codepoints = font_codepoints(font_path)
+        # Format: {character: [where]}
+        missing_chars = collections.OrderedDict()
+        for where, text in texts:
+            for char in text:
+                if (
+                    ord(char) not in covered_codepoints
+                    and not char.isspace()
+                    and unicodedata.category(char) not in UNDRAWN_CATEGORIES
+                ):
+                    missing_chars.setdefault(char, [])
+                    if where not in missing_chars[char]:
+                        missing_chars[char].append(where)
+
+        for char, wheres in missing_chars.items():
+            errors.append(
+                f"{language}: U+{ord(char):04X} {char!r} is missing from {font_path} "
+                f"(used in {', '.join(wheres)})"
+            )
+    return errors
+
+
+def preflight(languages):
+    """
+    Check the translations and the font coverage of `languages` without
+    rendering anything. Returns ([errors], [warnings]), errors would break the
+    guide while warnings point at text that is likely wrong.
+    """
+    errors, warnings = [], []
+    reference_translations = read_translations("en")
+    for language in languages:
+        translation_errors, translation_warnings = check_translations(language, reference_translations)
+        errors += translation_errors + check_glyphs(language)
+        warnings += translation_warnings
+    return errors, warnings
+
+
+def run_preflight(languages):
+    """Print the warnings and errors of `languages`, returns False if there were errors"""
+    with profiler.stage("pre-flight"):
+        errors, warnings = preflight(languages)
+    for warning in warnings:
+        print(f"Warning: {warning}")
+    for error in errors:
+        print(f"Error: {error}")
+    return not errors
@@ -0,0 +1,164 @@
+import collections
+import contextlib
+import csv
+import importlib
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows, peak memory is then not reported
+    resource = None
+
+# rss_growth_kb: how much the peak RSS of the process grew during the stage
+# children_rss_growth_kb: the same for the largest finished child process,
+#     i.e. wkhtmltopdf
+# python_peak_kb: peak Python allocations during the stage, over those at its
+#     start, only recorded with trace_memory
+# process_peak_rss_kb: peak RSS of the process so far
+REPORT_FIELDS = [
+    "language", "stage", "detail", "seconds", "rss_growth_kb", "children_rss_growth_kb",
+    "python_peak_kb", "process_peak_rss_kb",
+]
+
+
+def peak_rss_kb():
+    if resource is None:
+        return None, None
+    return (
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+
+
+class Profiler:
+    """
+    Records the wall time and memory use of named build stages. Disabled by
+    default, in which case `stage` does nothing, so hooks can stay in the
+    build code permanently.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        # Tracing Python allocations slows Python code down several times, so
+        # it is only done when asked for
+        self.trace_memory = False
+        self.language = None
+        self.records = []
+        # Python allocations of the stages in progress
+        self._open_stages = []
+        self._lock = threading.Lock()
+
+    def stage(self, name, detail=""):
+        if not self.enabled:
+            return contextlib.nullcontext()
+        return self._stage(name, detail)
+
+    @contextlib.contextmanager
+    def _stage(self, name, detail):
+        rss_before, children_rss_before = peak_rss_kb()
+        python_memory = None
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            with self._lock:
+                self._fold_python_peak()
+                python_memory = {"start": tracemalloc.get_traced_memory()[0]}
+                python_memory["peak"] = python_memory["start"]
+                self._open_stages.append(python_memory)
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start_time
+            if python_memory is not None:
+                with self._lock:
+                    self._fold_python_peak()
+                    self._open_stages.remove(python_memory)
+            rss, children_rss = peak_rss_kb()
+            self.record(name, seconds, detail, {
+                "rss_growth_kb": rss - rss_before if rss is not None else None,
+                "children_rss_growth_kb": (
+                    children_rss - children_rss_before if children_rss is not None else None
+                ),
+                "python_peak_kb": (
+                    (python_memory["peak"] - python_memory["start"]) // 1024
+                    if python_memory is not None else None
+                ),
+                "process_peak_rss_kb": rss,
+            })
+
+    def _fold_python_peak(self):
+        # tracemalloc only keeps a single peak, so it is handed to every open
+        # stage before it is reset for a nested or parallel one
+        _, python_peak = tracemalloc.get_traced_memory()
+        for python_memory in self._open_stages:
+            python_memory["peak"] = max(python_memory["peak"], python_peak)
+        tracemalloc.reset_peak()
+
+    def record(self, name, seconds, detail="", memory=None):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.records.append({
+                "language": self.language or "",
+                "stage": name,
+                "detail": detail,
+                "seconds": seconds,
+                **{field: (memory or {}).get(field) for field in REPORT_FIELDS[4:]},
+            })
+
+    def write_reports(self, report_dir):
+        os.makedirs(report_dir, exist_ok=True)
+        records_by_language = collections.defaultdict(list)
+        for record in self.records:
+            records_by_language[record["language"] or "all"].append(record)
+
+        for language, records in records_by_language.items():
+            with open(os.path.join(report_dir, f"profile-{language}.json"), "w") as fp:
+                json.dump(records, fp, indent=4)
+            with open(os.path.join(report_dir, f"profile-{language}.csv"), "w", newline="") as fp:
+                writer = csv.DictWriter(fp, fieldnames=REPORT_FIELDS)
+                writer.writeheader()
+                writer.writerows(records)
+
+    def summary(self):
+        stages = collections.OrderedDict()
+        for record in self.records:
+            stages.setdefault(record["stage"], []).append(record)
+
+        lines = [
+            f"{'Stage':<28} {'Calls':>6} {'Total (s)':>10} {'Mean (s)':>10} {'Max (s)':>10} "
+            f"{'RSS growth (MB)':>16} {'Python peak (MB)':>17}"
+        ]
+        for stage, records in stages.items():
+            seconds = [record["seconds"] for record in records]
+            memory = []
+            for field in ["rss_growth_kb", "python_peak_kb"]:
+                values = [record[field] for record in records if record[field] is not None]
+                memory.append(f"{max(values) / 1024:.1f}" if values else "-")
+            lines.append(
+                f"{stage:<28} {len(seconds):>6} {sum(seconds):>10.3f} "
+                f"{sum(seconds) / len(seconds):>10.4f} {max(seconds):>10.3f} {memory[0]:>16} {memory[1]:>17}"
+            )
+        return "\n".join(lines)
+
+
+profiler = Profiler()
+
+
+def timed_import(module_name):
+    """
+    Import `module_name` on first use. Heavy and engine or locale specific
+    modules are imported through this so commands that do not need them
+    start fast, and the first import is recorded as an "import" stage.
+    """
+    if module_name not in sys.modules:
+        with profiler.stage("import", detail=module_name):
+            importlib.import_module(module_name)
+    return sys.modules[module_name]
@@ -0,0 +1,236 @@
+import functools
+import hashlib
+import json
+import os
+import tempfile
+
+import arabic_reshaper
+import bidi
+
+# get_bidi_levels runs the steps of the bidi algorithm one by one, using
+# internals that only python-bidi 0.4.x has. 0.5 replaced them with a Rust
+# implementation, so requirements.txt pins python-bidi==0.4.2.
+try:
+    from bidi.algorithm import (
+        MIRRORED,
+        explicit_embed_and_overrides,
+        get_display,
+        get_embedding_levels,
+        get_empty_storage,
+        resolve_implicit_levels,
+        resolve_neutral_types,
+        resolve_weak_types,
+    )
+except ImportError as e:
+    raise RuntimeError(
+        f"Urdu guides need python-bidi 0.4.x, found "
+        f"{getattr(bidi, 'VERSION', getattr(bidi, '__version__', 'an unknown version'))}. "
+        f"Install the versions in requirements.txt"
+    ) from e
+from reportlab.platypus import FragLine, ParaLines
+
+from locales import load_translations
+from page_cache import file_hash
+from page_manifest import contributor_texts, load_manifest
+
+URDU_FONT = "assets/fonts/urdu/Roboto_NotoNaskhArabic-Regular.ttf"
+URDU_TRANSLATIONS = "translations/ur.json"
+URDU_CACHE_DIR = ".cache/urdu"
+
+# Urdu paragraphs are always right-to-left, whatever their first word is
+RTL_LEVEL = 1
+
+# Format: {text: reshaped text} and {reshaped paragraph text: [bidi level of
+# every character]}, persisted between runs in URDU_CACHE_DIR
+reshaped_texts = {}
+bidi_levels = {}
+
+
+@functools.lru_cache(maxsize=None)
+def get_urdu_reshaper(font_path=URDU_FONT):
+    # Building the config parses the whole font file, so only do it once
+    return arabic_reshaper.ArabicReshaper(
+        arabic_reshaper.config_for_true_type_font(
+            font_path, arabic_reshaper.ENABLE_ALL_LIGATURES,
+        )
+    )
+
+
+def urdu_cache_path(font_path=URDU_FONT):
+    # Reshaped text depends on the ligatures available in the font and on the
+    # reshaper itself, and both only ever change with the translations or the
+    # libraries
+    cache_key = hashlib.sha256(
+        ":".join(
+            [
+                file_hash(URDU_TRANSLATIONS),
+                file_hash(font_path),
+                arabic_reshaper.__version__,
+                bidi.VERSION,
+            ]
+        ).encode("utf-8")
+    ).hexdigest()[:16]
+    return os.path.join(URDU_CACHE_DIR, f"{cache_key}.json")
+
+
+def load_urdu_cache(font_path=URDU_FONT):
+    cache_path = urdu_cache_path(font_path)
+    if os.path.exists(cache_path):
+        with open(cache_path, encoding="utf-8") as fp:
+            cache = json.load(fp)
+        reshaped_texts.update(cache["reshaped"])
+        bidi_levels.update(cache["levels"])
+
+
+def save_urdu_cache(font_path=URDU_FONT):
+    os.makedirs(URDU_CACHE_DIR, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=URDU_CACHE_DIR, suffix=".json")
+    with os.fdopen(fd, "w", encoding="utf-8") as fp:
+        json.dump({"reshaped": reshaped_texts, "levels": bidi_levels}, fp, ensure_ascii=False)
+    os.replace(tmp_path, urdu_cache_path(font_path))
+
+
+def text_transform_urdu(text):
+    if text not in reshaped_texts:
+        reshaped_texts[text] = get_urdu_reshaper().reshape(text)
+    return reshaped_texts[text]
+
+
+def prepare_urdu_texts():
+    """
+    Reshape the whole Urdu string table in one pass, so that laying out the
+    pages only looks up reshaped strings. A no-op when the cache for the
+    current translations was loaded.
+    """
+    manifest = load_manifest()
+    texts = list(load_translations("ur").values())
+    texts += contributor_texts(manifest) + [manifest.creator]
+    for text in texts:
+        text_transform_urdu(text)
+
+
+def get_bidi_levels(text):
+    """
+    Resolved embedding level of every character of `text` (UAX #9 rules up
+    to I2). Line breaking does not change the resolved levels, so they are
+    resolved once per paragraph and every wrapped line is reordered from
+    its slice of them.
+    """
+    if text not in bidi_levels:
+        storage = get_empty_storage()
+        storage["base_level"] = RTL_LEVEL
+        storage["base_dir"] = "R"
+        get_embedding_levels(text, storage, False, False)
+        # Explicit formatting characters are dropped while resolving, keep
+        # track of where every remaining character came from
+        for char_idx, char in enumerate(storage["chars"]):
+            char["index"] = char_idx
+        explicit_embed_and_overrides(storage, False)
+        resolve_weak_types(storage, False)
+        resolve_neutral_types(storage, False)
+        resolve_implicit_levels(storage, False)
+
+        levels = [RTL_LEVEL] * len(text)
+        for char in storage["chars"]:
+            levels[char["index"]] = char["level"]
+        bidi_levels[text] = levels
+    return bidi_levels[text]
+
+
+def reorder_line(text, levels):
+    """Visual order of one line of text given its resolved levels (L1, L2 and L4)"""
+    levels = list(levels)
+    # L1: trailing whitespace goes back to the paragraph level
+    char_idx = len(text) - 1
+    while char_idx >= 0 and text[char_idx].isspace():
+        levels[char_idx] = RTL_LEVEL
+        char_idx -= 1
+
+    odd_levels = [level for level in levels if level % 2]
+    if not odd_levels:
+        return text
+
+    chars = [
+        MIRRORED.get(char, char) if level % 2 else char
+        for char, level in zip(text, levels)
+    ]
+    # L2: from the highest level down to the lowest odd one, reverse every
+    # run of characters at that level or higher
+    for reverse_level in range(max(levels), min(odd_levels) - 1, -1):
+        run_start = None
+        for char_idx in range(len(chars) + 1):
+            if char_idx < len(chars) and levels[char_idx] >= reverse_level:
+                if run_start is None:
+                    run_start = char_idx
+            elif run_start is not None:
+                chars[run_start:char_idx] = reversed(chars[run_start:char_idx])
+                levels[run_start:char_idx] = reversed(levels[run_start:char_idx])
+                run_start = None
+    return "".join(chars)
+
+
+@functools.lru_cache(maxsize=None)
+def cached_get_display(text):
+    return get_display(text)
+
+
+def paragraph_transform_urdu(paragraph):
+    # Inplace line reverser
+    plain_text = "".join(getattr(frag, "text", "") for frag in paragraph.frags)
+    levels = get_bidi_levels(plain_text)
+    cursor = 0
+
+    def text_levels(text):
+        # Lines are made of consecutive pieces of the paragraph text, with
+        # the whitespace they were broken at dropped
+        nonlocal cursor
+        start = plain_text.find(text, cursor)
+        if start == -1:
+            return None
+        cursor = start + len(text)
+        return levels[start:cursor]
+
+    def transform_text(text):
+        text_level = text_levels(text)
+        if text_level is None:
+            return cached_get_display(text)
+        return reorder_line(text, text_level)
+
+    transformed_lines = []
+    for line in paragraph.blPara.lines:
+        if isinstance(line, tuple):
+            line_levels = []
+            # Level of the space in front of the next word, i.e. of the
+            # whitespace after the previous word in the paragraph text
+            space_level = RTL_LEVEL
+            for word_idx, word in enumerate(line[1]):
+                word_levels = text_levels(word)
+                if word_levels is None:
+                    line_levels = None
+                    break
+                if word_idx > 0:
+                    line_levels.append(space_level)
+                line_levels += word_levels
+                space_level = (
+                    levels[cursor]
+                    if cursor < len(plain_text) and plain_text[cursor].isspace()
+                    else RTL_LEVEL
+                )
+
+            line_text = " ".join(line[1])
+            if line_levels is None:
+                line_text = cached_get_display(line_text)
+            else:
+                line_text = reorder_line(line_text, line_levels)
+            transformed_lines.append((line[0], line_text.split(" ")))
+        elif isinstance(line, FragLine):
+            for subline in line.words:
+                subline.text = transform_text(subline.text)
+            transformed_lines.append(line)
+        elif isinstance(line, ParaLines):
+            for subline in line.words:
+                subline.text = transform_text(subline.text)
+            transformed_lines.append(line)
+        else:
+            assert False, f"Unhandled line type {type(line)}"
+    paragraph.blPara.lines = transformed_lines
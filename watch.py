@@ -0,0 +1,102 @@
+import os
+import time
+
+from fonts import LOCALE_FONTS
+from locales import TRANSLATIONS_DIR, load_translations
+from page_manifest import MANIFEST_PATH, load_manifest
+
+ROOT_DIR = os.path.abspath(os.path.dirname(__file__))
+FONTS_DIR = os.path.join(ROOT_DIR, "assets", "fonts")
+
+# Everything a guide is built from
+WATCH_PATHS = [
+    TRANSLATIONS_DIR,
+    MANIFEST_PATH,
+    os.path.join(ROOT_DIR, "main.css"),
+    os.path.join(ROOT_DIR, "site.css"),
+    os.path.join(ROOT_DIR, "assets"),
+]
+
+# How often to look for changes, and how long files have to stay unchanged
+# before rebuilding, so saving several files at once only rebuilds once
+POLL_INTERVAL = 0.3
+DEBOUNCE = 0.5
+
+
+def snapshot(paths=WATCH_PATHS):
+    """Format: {file path: (modification time, size)}"""
+    files = {}
+    for path in paths:
+        if os.path.isfile(path):
+            file_paths = [path]
+        else:
+            file_paths = [
+                os.path.join(dir_path, file_name)
+                for dir_path, _, file_names in os.walk(path)
+                for file_name in file_names
+            ]
+        for file_path in file_paths:
+            try:
+                stat = os.stat(file_path)
+            except FileNotFoundError:
+                continue
+            files[file_path] = (stat.st_mtime_ns, stat.st_size)
+    return files
+
+
+def wait_for_changes(previous_snapshot):
+    """
+    Block until the watched files change and then stay unchanged for
+    DEBOUNCE seconds. Returns (changed file paths, new snapshot).
+    """
+    while True:
+        time.sleep(POLL_INTERVAL)
+        current_snapshot = snapshot()
+        if current_snapshot == previous_snapshot:
+            continue
+
+        # Debounce until editors are done writing
+        settled_snapshot = current_snapshot
+        while True:
+            time.sleep(DEBOUNCE)
+            current_snapshot = snapshot()
+            if current_snapshot == settled_snapshot:
+                break
+            settled_snapshot = current_snapshot
+
+        changed_paths = {
+            path
+            for path in set(previous_snapshot) | set(settled_snapshot)
+            if previous_snapshot.get(path) != settled_snapshot.get(path)
+        }
+        return changed_paths, settled_snapshot
+
+
+def affected_languages(changed_paths, languages):
+    """The locales among `languages` whose guides depend on `changed_paths`"""
+    affected = set()
+    for path in changed_paths:
+        if os.path.dirname(path) == TRANSLATIONS_DIR:
+            locale = os.path.splitext(os.path.basename(path))[0]
+            if locale in languages:
+                affected.add(locale)
+            continue
+
+        font_languages = {
+            language
+            for language in languages
+            if any(os.path.join(ROOT_DIR, font_path) == path for font_path in LOCALE_FONTS[language])
+        }
+        if font_languages or path.startswith(FONTS_DIR + os.sep):
+            # Fonts no requested locale uses do not affect anything
+            affected |= font_languages
+        else:
+            # Styles, the manifest and screenshots are shared by every locale
+            affected |= set(languages)
+    return [language for language in languages if language in affected]
+
+
+def reload_inputs():
+    # Translations and the manifest are cached for the lifetime of the process
+    load_translations.cache_clear()
+    load_manifest.cache_clear()
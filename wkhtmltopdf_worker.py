@@ -0,0 +1,171 @@
+import os
+import queue
+import shutil
+import subprocess
+import tempfile
+import threading
+
+from profiling import timed_import
+
+# How long to wait for a single page before giving up on a worker
+JOB_TIMEOUT = 120
+
+
+def quote_arg(arg):
+    # wkhtmltopdf splits the lines it reads from stdin on whitespace, with
+    # support for double quotes and backslash escapes
+    return '"' + arg.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def options_to_args(options):
+    args = []
+    for option, value in options.items():
+        # Progress output is how workers report that a page is done
+        if option == "quiet":
+            continue
+        args.append(f"--{option}")
+        if value is not None:
+            args.append(str(value))
+    return args
+
+
+class WkhtmltopdfWorker:
+    """
+    A long running `wkhtmltopdf --read-args-from-stdin` process. Every line
+    written to its stdin is a complete set of arguments for one conversion, so
+    Qt/WebKit start up and font loading are only paid once per worker.
+    """
+
+    def __init__(self, wkhtmltopdf, work_dir):
+        self.work_dir = work_dir
+        self.process = subprocess.Popen(
+            [wkhtmltopdf, "--read-args-from-stdin"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            encoding="utf-8",
+            errors="replace",
+        )
+        self.output_lines = queue.Queue()
+        self.reader = threading.Thread(target=self._read_output, daemon=True)
+        self.reader.start()
+        self.job_idx = 0
+
+    def _read_output(self):
+        for line in self.process.stderr:
+            self.output_lines.put(line)
+        # None marks that the process exited
+        self.output_lines.put(None)
+
+    def render(self, html, options):
+        self.job_idx += 1
+        job_prefix = os.path.join(self.work_dir, f"{id(self)}-{self.job_idx}")
+        input_path, output_path = f"{job_prefix}.html", f"{job_prefix}.pdf"
+        with open(input_path, "w", encoding="utf-8") as fp:
+            fp.write(html)
+
+        try:
+            args = options_to_args(options) + [input_path, output_path]
+            self.process.stdin.write(" ".join(quote_arg(arg) for arg in args) + "\n")
+            self.process.stdin.flush()
+
+            # wkhtmltopdf reports "Done" once a conversion has finished and
+            # exits if a conversion fails
+            while True:
+                line = self.output_lines.get(timeout=JOB_TIMEOUT)
+                if line is None:
+                    raise RuntimeError("wkhtmltopdf worker exited while rendering a page")
+                if line.strip().endswith("Done"):
+                    break
+
+            with open(output_path, "rb") as fp:
+                return fp.read()
+        finally:
+            for path in (input_path, output_path):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def close(self):
+        if self.process.poll() is None:
+            try:
+                self.process.stdin.close()
+                self.process.wait(timeout=10)
+            except (OSError, subprocess.TimeoutExpired):
+                self.process.kill()
+                self.process.wait()
+
+
+class WkhtmltopdfPool:
+    """
+    A pool of persistent wkhtmltopdf workers shared across pages and locales.
+    If workers cannot be started or fail, pages are rendered with a fresh
+    wkhtmltopdf process per page through pdfkit instead.
+    """
+
+    def __init__(self, size=1):
+        self.size = size
+        self.wkhtmltopdf = shutil.which("wkhtmltopdf")
+        self.available = self.wkhtmltopdf is not None
+        self.work_dir = tempfile.mkdtemp(prefix="wkhtmltopdf-")
+        self.idle_workers = queue.Queue()
+        self.workers = []
+        self.lock = threading.Lock()
+
+    def _get_worker(self):
+        while self.available:
+            try:
+                return self.idle_workers.get_nowait()
+            except queue.Empty:
+                pass
+            with self.lock:
+                if len(self.workers) < self.size:
+                    worker = WkhtmltopdfWorker(self.wkhtmltopdf, self.work_dir)
+                    self.workers.append(worker)
+                    return worker
+            try:
+                return self.idle_workers.get(timeout=1)
+            except queue.Empty:
+                continue
+        raise RuntimeError("persistent wkhtmltopdf workers were shut down")
+
+    def _discard_worker(self, worker):
+        worker.close()
+        with self.lock:
+            if worker in self.workers:
+                self.workers.remove(worker)
+
+    def _fall_back(self, reason):
+        with self.lock:
+            if self.available:
+                print(f"Persistent wkhtmltopdf unavailable ({reason}), rendering pages with pdfkit")
+                self.available = False
+
+    def render(self, html, options):
+        if self.available:
+            worker = None
+            try:
+                worker = self._get_worker()
+                page_pdf = worker.render(html, options)
+            except (OSError, RuntimeError, queue.Empty) as e:
+                if worker is not None:
+                    self._discard_worker(worker)
+                self._fall_back(e)
+            else:
+                self.idle_workers.put(worker)
+                return page_pdf
+
+        return timed_import("pdfkit").from_string(html, False, options=options)
+
+    def close(self):
+        self.available = False
+        with self.lock:
+            for worker in self.workers:
+                worker.close()
+            self.workers = []
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()